@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def no_thumbnail_pool(monkeypatch):
+    """Без фонового пула миниатюр: его потоки пишут в MEDIA_ROOT, который
+    тесты удаляют сразу по завершении."""
+    from posts import thumbnails
+
+    monkeypatch.setattr(thumbnails, 'THUMBNAIL_PREGENERATE', False)
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+
+from core import metrics
+from core.utils import cache_is_shared
+from yatube.settings import REQUEST_METRICS_CACHE
+
+
+class Command(BaseCommand):
+    help = 'Показывает средние замеры запросов по вью.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset', action='store_true', help='Обнулить замеры.'
+        )
+
+    def handle(self, *args, **options):
+        if not cache_is_shared(REQUEST_METRICS_CACHE):
+            self.stdout.write(
+                self.style.WARNING(
+                    f'Кэш {REQUEST_METRICS_CACHE} живёт внутри процесса: '
+                    'замеров веб-воркеров здесь не видно.'
+                )
+            )
+        if options['reset']:
+            metrics.reset()
+            self.stdout.write('Замеры обнулены.')
+            return
+        stats = metrics.stats()
+        if not stats:
+            self.stdout.write('Замеров пока нет.')
+            return
+        for view, values in sorted(
+            stats.items(), key=lambda item: -item[1]['wall_ms']
+        ):
+            self.stdout.write(
+                f'{view}: запросов {values["requests"]}, '
+                f'SQL {values["queries"]:.1f} '
+                f'(повторов {values["duplicates"]:.1f}), '
+                f'база {values["db_ms"]:.0f} мс, '
+                f'шаблоны {values["template_ms"]:.0f} мс, '
+                f'всего {values["wall_ms"]:.0f} мс'
+            )
@@ -0,0 +1,195 @@
+import logging
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import monotonic, perf_counter
+
+from django.core.cache import caches
+
+from yatube.settings import (
+    REQUEST_BUDGET,
+    REQUEST_BUDGET_OVERRIDES,
+    REQUEST_METRICS_CACHE,
+    REQUEST_METRICS_FLUSH_SAMPLES,
+    REQUEST_METRICS_FLUSH_SECONDS,
+)
+
+METRIC_KEY = 'metrics:{}:{}'
+VIEWS_KEY = 'metrics:views'
+REQUESTS = 'requests'
+FIELDS = ('queries', 'duplicates', 'db_ms', 'template_ms', 'wall_ms')
+UNRESOLVED = '-'
+SQL_PREVIEW = 200
+
+logger = logging.getLogger(__name__)
+
+current = ContextVar('metrics_sample', default=None)
+
+# Суммы замеров процесса, ещё не отправленные в кэш: {вью: Counter}.
+pending = {}
+pending_lock = threading.Lock()
+flushed_at = monotonic()
+
+
+def store():
+    return caches[REQUEST_METRICS_CACHE]
+
+
+class Sample:
+    """Замеры одного запроса. Экземпляр служит и обёрткой
+    connection.execute_wrapper: считает SQL-запросы и время в базе."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db = 0.0
+        self.template = 0.0
+        self.rendering = False
+        self.wall = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += perf_counter() - started
+            self.queries += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Повторы одного и того же SQL с разными параметрами: так
+        выглядит N+1, когда связанные объекты грузятся по одному."""
+        return sum(count - 1 for count in self.statements.values())
+
+    def values(self) -> dict:
+        return {
+            'queries': self.queries,
+            'duplicates': self.duplicates,
+            'db_ms': round(self.db * 1000),
+            'template_ms': round(self.template * 1000),
+            'wall_ms': round(self.wall * 1000),
+        }
+
+
+@contextmanager
+def template_timer():
+    """Время рендеринга шаблонов. Вложенный рендеринг (render_to_string
+    внутри тега) уже входит во внешний и отдельно не считается."""
+    sample = current.get()
+    if sample is None or sample.rendering:
+        yield
+        return
+    sample.rendering = True
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        sample.template += perf_counter() - started
+        sample.rendering = False
+
+
+def budget(view_name: str) -> dict:
+    return {**REQUEST_BUDGET, **REQUEST_BUDGET_OVERRIDES.get(view_name, {})}
+
+
+def add(metrics_cache, key: str, delta: int) -> None:
+    try:
+        metrics_cache.incr(key, delta)
+    except ValueError:
+        metrics_cache.add(key, delta, None)
+
+
+def flush() -> None:
+    """Отправляет накопленные суммы в кэш REQUEST_METRICS_CACHE: по
+    одному incr на поле вью за всю пачку замеров."""
+    global pending, flushed_at
+    with pending_lock:
+        batch, pending = pending, {}
+        flushed_at = monotonic()
+    metrics_cache = store()
+    for view_name, totals in batch.items():
+        if metrics_cache.add(METRIC_KEY.format(view_name, REQUESTS), 0, None):
+            views = metrics_cache.get(VIEWS_KEY, [])
+            metrics_cache.set(VIEWS_KEY, sorted({*views, view_name}), None)
+        for field, value in totals.items():
+            add(metrics_cache, METRIC_KEY.format(view_name, field), value)
+
+
+def record(view_name: str, sample: Sample) -> dict:
+    """Добавляет замеры к суммам вью и пишет в лог превышение бюджета
+    вместе с самым частым повторяющимся запросом.
+
+    Суммы копятся в процессе и уходят в кэш раз в
+    REQUEST_METRICS_FLUSH_SAMPLES замеров или
+    REQUEST_METRICS_FLUSH_SECONDS секунд. Не отправленное до
+    перезапуска процесса теряется: для выборочных замеров это не страшно.
+    """
+    values = sample.values()
+    with pending_lock:
+        totals = pending.setdefault(view_name, Counter())
+        totals[REQUESTS] += 1
+        totals.update(values)
+        due = (
+            sum(view[REQUESTS] for view in pending.values())
+            >= REQUEST_METRICS_FLUSH_SAMPLES
+            or monotonic() - flushed_at >= REQUEST_METRICS_FLUSH_SECONDS
+        )
+    if due:
+        flush()
+    limits = budget(view_name)
+    exceeded = sorted(
+        field
+        for field, value in values.items()
+        if field in limits and value > limits[field]
+    )
+    if exceeded:
+        sql, repeats = (sample.statements.most_common(1) or [('', 0)])[0]
+        logger.warning(
+            '%s превысил бюджет по %s: %s. Чаще всего (%d раз): %s',
+            view_name,
+            ', '.join(exceeded),
+            values,
+            repeats,
+            sql[:SQL_PREVIEW],
+            extra={'view_name': view_name, 'metrics': values},
+        )
+    return values
+
+
+def stats() -> dict:
+    """{вью: {requests и средние значения FIELDS на запрос}}."""
+    metrics_cache = store()
+    views = metrics_cache.get(VIEWS_KEY, [])
+    keys = [
+        METRIC_KEY.format(view, field)
+        for view in views
+        for field in (REQUESTS, *FIELDS)
+    ]
+    totals = metrics_cache.get_many(keys)
+    result = {}
+    for view in views:
+        requests = totals.get(METRIC_KEY.format(view, REQUESTS), 0)
+        result[view] = {
+            REQUESTS: requests,
+            **{
+                field: totals.get(METRIC_KEY.format(view, field), 0)
+                / max(requests, 1)
+                for field in FIELDS
+            },
+        }
+    return result
+
+
+def reset() -> None:
+    metrics_cache = store()
+    views = metrics_cache.get(VIEWS_KEY, [])
+    metrics_cache.delete_many(
+        [
+            METRIC_KEY.format(view, field)
+            for view in views
+            for field in (REQUESTS, *FIELDS)
+        ]
+    )
+    metrics_cache.delete(VIEWS_KEY)
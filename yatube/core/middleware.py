@@ -0,0 +1,80 @@
+import random
+from contextlib import ExitStack
+from time import perf_counter
+
+from django.db import connections
+
+from core import metrics
+from core.routers import written
+from yatube.settings import (
+    REPLICA_PIN_COOKIE,
+    REPLICA_PIN_SECONDS,
+    REQUEST_METRICS_SAMPLE_RATE,
+)
+
+
+class ReplicaPinMiddleware:
+    """После записи на REPLICA_PIN_SECONDS закрепляет чтение пользователя
+    за основной базой: так он сразу видит свой пост, комментарий или
+    подписку, даже если реплика отстаёт.
+
+    Запись замечает сам роутер, поэтому учитываются и GET-вью, которые
+    пишут в базу, вроде подписки на автора.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = written.set(False)
+        try:
+            response = self.get_response(request)
+            wrote = written.get()
+        finally:
+            written.reset(token)
+        if wrote and request.user.is_authenticated:
+            response.set_cookie(
+                REPLICA_PIN_COOKIE,
+                '1',
+                max_age=REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
+
+
+class RequestMetricsMiddleware:
+    """Замеряет долю REQUEST_METRICS_SAMPLE_RATE запросов: число
+    SQL-запросов и их повторы, время в базе, рендеринга шаблонов и всего
+    запроса. Суммы по имени вью пачками уходят в общий кэш
+    REQUEST_METRICS_CACHE (см. request_metrics), превышение
+    REQUEST_BUDGET пишется в лог.
+
+    Запросы вне выборки проходят без обёрток и почти без накладных
+    расходов, поэтому middleware можно держать включённым в продакшене.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        sample = metrics.Sample()
+        token = metrics.current.set(sample)
+        started = perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(sample)
+                    )
+                response = self.get_response(request)
+        finally:
+            sample.wall = perf_counter() - started
+            metrics.current.reset(token)
+        match = request.resolver_match
+        metrics.record(
+            match.view_name if match else metrics.UNRESOLVED, sample
+        )
+        return response
@@ -0,0 +1,215 @@
+from calendar import timegm
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import wraps
+from hashlib import md5
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from core.routers import primary_reads
+from core.utils import ARCHIVE_MARK, decode_cursor, encode_cursor
+from yatube.settings import PAGE_CACHE_TIMEOUT, REPLICA_PIN_SECONDS
+
+PAGE_KEY = 'page:{}'
+GENERATION_KEY = 'page:generation:{}'
+VALIDATORS_KEY = 'page:validators:{}'
+HITS_KEY = 'page:hits'
+MISSES_KEY = 'page:misses'
+PAGE_PARAMS = ('page', 'after', 'before')
+
+
+def digest(*parts) -> str:
+    """Ключи кэша — хэши: в слагах и именах бывает кириллица, которую не
+    принимает memcached, а длина пути ничем не ограничена."""
+    return md5('|'.join(map(str, parts)).encode()).hexdigest()
+
+
+def generation(namespace: str):
+    """Момент последнего сброса пространства имён.
+
+    Потерянное поколение заводится заново текущим временем: это только
+    лишний промах, но не возврат к старым страницам.
+    """
+    key = GENERATION_KEY.format(digest(namespace))
+    value = cache.get(key)
+    if value is None:
+        now = timezone.now()
+        cache.add(key, now, None)
+        value = cache.get(key, now)
+    return value
+
+
+def purge(*namespaces) -> None:
+    """Сбрасывает все закэшированные страницы пространств имён.
+
+    Страницы не перечисляются: пространство получает новое поколение,
+    и старые ключи становятся недостижимы до истечения своего TTL.
+    """
+    now = timezone.now()
+    cache.set_many(
+        {GENERATION_KEY.format(digest(name)): now for name in namespaces},
+        None,
+    )
+
+
+def fill_reads(purged):
+    """Где читать данные для кэша после сброса purged.
+
+    Если сброс был недавно, реплика могла ещё не получить запись, ради
+    которой он случился: собранная из неё страница или валидаторы
+    продержались бы в кэше весь TTL. Отставание реплики считается не
+    больше REPLICA_PIN_SECONDS, и в это окно кэш наполняет основная база.
+    """
+    if timezone.now() - purged < timedelta(seconds=REPLICA_PIN_SECONDS):
+        return primary_reads()
+    return nullcontext()
+
+
+def count(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def stats() -> dict:
+    values = cache.get_many([HITS_KEY, MISSES_KEY])
+    return {
+        'hits': values.get(HITS_KEY, 0),
+        'misses': values.get(MISSES_KEY, 0),
+    }
+
+
+def page_param(name: str, value: str):
+    """Каноническое значение параметра страницы или None для битого."""
+    if name == 'page':
+        return str(int(value)) if value.isascii() and value.isdigit() else None
+    token = value.lstrip(ARCHIVE_MARK)
+    cursor = decode_cursor(token)
+    if cursor is None:
+        return None
+    return (ARCHIVE_MARK if token != value else '') + encode_cursor(*cursor)
+
+
+def page_query(request):
+    """Параметры страницы для ключей и ETag; None, если какой-то из них
+    битый. Такие запросы не кэшируются: случайные значения не должны
+    забивать кэш."""
+    params = []
+    for name in PAGE_PARAMS:
+        if name in request.GET:
+            value = page_param(name, request.GET[name])
+            if value is None:
+                return None
+            params.append(f'{name}={value}')
+    return '&'.join(params)
+
+
+def page_key(request, namespace: str, purged, query: str) -> str:
+    return PAGE_KEY.format(
+        digest(namespace, purged.isoformat(), request.path, query)
+    )
+
+
+def anonymous_page_cache(namespace: str, timeout: int = PAGE_CACHE_TIMEOUT):
+    """Кэширует готовый HTML страницы для анонимных GET-запросов.
+
+    namespace форматируется аргументами вью, например 'group:{slug}',
+    и служит единицей сброса для purge().
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            query = page_query(request)
+            if (
+                request.method != 'GET'
+                or request.user.is_authenticated
+                or query is None
+            ):
+                return view(request, *args, **kwargs)
+            name = namespace.format(**kwargs)
+            purged = generation(name)
+            key = page_key(request, name, purged, query)
+            cached = cache.get(key)
+            if cached is not None:
+                count(HITS_KEY)
+                content, content_type = cached
+                response = HttpResponse(content, content_type=content_type)
+                response['X-Page-Cache'] = 'hit'
+                return response
+            count(MISSES_KEY)
+            with fill_reads(purged):
+                response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.cookies:
+                cache.set(
+                    key, (response.content, response['Content-Type']), timeout
+                )
+            response['X-Page-Cache'] = 'miss'
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_page(namespace: str, validators):
+    """Отвечает 304 на If-None-Match/If-Modified-Since до рендеринга.
+
+    validators(request, **kwargs) возвращает пару (время последнего
+    изменения данных, маркер вроде максимального pk) из одного дешёвого
+    запроса или None, если объекта страницы нет: тогда вью само отвечает
+    404 и валидаторов не получает. Поколение пространства имён добавляет
+    к ним правки и удаления, которые не двигают максимумы. Любое
+    изменение данных сбрасывает поколение, поэтому сами валидаторы
+    кэшируются по нему и повторный запрос вовсе не ходит в базу.
+    ETag и Last-Modified ставятся только на ответы 200. Сразу после
+    сброса валидаторы и страница читаются из основной базы (fill_reads).
+    """
+
+    def state(request, kwargs):
+        query = page_query(request)
+        if request.method not in ('GET', 'HEAD') or query is None:
+            return None
+        name = namespace.format(**kwargs)
+        purged = generation(name)
+        key = VALIDATORS_KEY.format(digest(name, purged.isoformat()))
+        found = cache.get(key)
+        if found is None:
+            with fill_reads(purged):
+                found = validators(request, **kwargs)
+            if found is None:
+                return None
+            cache.set(key, found, PAGE_CACHE_TIMEOUT)
+        changed, marker = found
+        etag = digest(name, purged.isoformat(), marker, request.user.pk, query)
+        changed = max(changed, purged) if changed else purged
+        return quote_etag(etag), timegm(changed.utctimetuple()), purged
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            found = state(request, kwargs)
+            if found is None:
+                return view(request, *args, **kwargs)
+            etag, last_modified, purged = found
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is None:
+                # Отданная под ETag страница тоже не должна быть старее него.
+                with fill_reads(purged):
+                    response = view(request, *args, **kwargs)
+            # 304 повторяет валидаторы, которые отдал бы 200 (RFC 7232, 4.1).
+            if response.status_code in (200, 304):
+                response.setdefault('ETag', etag)
+                response.setdefault('Last-Modified', http_date(last_modified))
+            return response
+
+        return wrapper
+
+    return decorator
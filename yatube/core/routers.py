@@ -0,0 +1,78 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.db import DEFAULT_DB_ALIAS
+
+from yatube.settings import DATABASE_REPLICAS, REPLICA_PIN_COOKIE
+
+READ_METHODS = ('GET', 'HEAD')
+# Приложения, которые читаются из реплик и запись в которые закрепляет
+# пользователя за основной базой. Сессии и пользователи всегда живут в
+# основной, поэтому вход в систему закреплять не нужно.
+CONTENT_APPS = ('posts',)
+
+replica = ContextVar('replica', default=None)
+written = ContextVar('written', default=False)
+
+
+class ReplicaRouter:
+    """Запись всегда идёт в основную базу. Чтение моделей CONTENT_APPS
+    идёт в реплику, которую выбрал replica_reads для текущего запроса,
+    всё остальное (сессии, пользователи) — тоже в основную: отставшая
+    реплика не должна разлогинивать только что вошедшего."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in CONTENT_APPS:
+            return replica.get() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label in CONTENT_APPS:
+            written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика хранит те же строки, что и основная база.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схему на реплики приносит репликация, а не migrate.
+        return db == DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def primary_reads():
+    """Чтение внутри блока идёт в основную базу, даже во вью
+    replica_reads."""
+    token = replica.set(None)
+    try:
+        yield
+    finally:
+        replica.reset(token)
+
+
+def replica_reads(view):
+    """Читает данные вью из случайной реплики из DATABASE_REPLICAS.
+
+    Пользователь, который только что что-то записал, несёт cookie
+    REPLICA_PIN_COOKIE и читает из основной базы: реплика могла ещё не
+    догнать его запись.
+    """
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if (
+            not DATABASE_REPLICAS
+            or request.method not in READ_METHODS
+            or REPLICA_PIN_COOKIE in request.COOKIES
+        ):
+            return view(request, *args, **kwargs)
+        token = replica.set(random.choice(DATABASE_REPLICAS))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            replica.reset(token)
+
+    return wrapper
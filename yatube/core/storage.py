@@ -0,0 +1,91 @@
+import hashlib
+import os
+import re
+import tempfile
+from textwrap import wrap
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+from yatube.settings import CONTENT_SHARD_LEVELS
+
+SHARD_WIDTH = 2
+CONTENT_NAME = re.compile(
+    r'(^|/)([0-9a-f]{%d}/){%d}[0-9a-f]{64}(\.\w+)?$'
+    % (SHARD_WIDTH, CONTENT_SHARD_LEVELS)
+)
+
+
+def is_content_addressed(name: str) -> bool:
+    return CONTENT_NAME.search(name) is not None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, где имя файла — sha256 его содержимого.
+
+    Файлы раскладываются по вложенным каталогам из первых символов хэша
+    (posts/ab/cd/abcd….jpg), так что ни один каталог не разрастается.
+    Повторная загрузка того же содержимого даёт то же имя и не пишет
+    файл второй раз, а только обновляет время его изменения: уборка
+    старых файлов по возрасту не удалит картинку, которую только что
+    загрузили снова.
+    """
+
+    def content_name(self, name: str, content) -> str:
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        hexdigest = digest.hexdigest()
+        shards = wrap(hexdigest, SHARD_WIDTH)[:CONTENT_SHARD_LEVELS]
+        directory, basename = os.path.split(name)
+        extension = os.path.splitext(basename)[1].lower()
+        return '/'.join(
+            part
+            for part in (directory, *shards, hexdigest + extension)
+            if part
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        return super().save(
+            self.content_name(name, content), content, max_length
+        )
+
+    def get_available_name(self, name, max_length=None):
+        # Занятое имя означает то же содержимое: суффикс не нужен.
+        return name
+
+    def _save(self, name, content):
+        if self.exists(name):
+            os.utime(self.path(name))
+            return name
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        if self.directory_permissions_mode is not None:
+            old_umask = os.umask(0)
+            try:
+                os.makedirs(
+                    directory, self.directory_permissions_mode, exist_ok=True
+                )
+            finally:
+                os.umask(old_umask)
+        else:
+            os.makedirs(directory, exist_ok=True)
+        # Пишем во временный файл рядом и атомарно переименовываем:
+        # одновременные загрузки одной картинки не мешают друг другу.
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                for chunk in content.chunks():
+                    output.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temporary, self.file_permissions_mode)
+            os.replace(temporary, full_path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return name
@@ -1,9 +1,214 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.http import Http404
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
 
 from yatube.settings import PAGE_SIZE
 
+CURSOR_SEPARATOR = '|'
+ARCHIVE_MARK = '~'
+LOCAL_CACHE_WARNING = (
+    'Кэш живёт внутри процесса: веб-воркеры не увидят сброса из этой '
+    'команды, пока их не перезапустят.'
+)
+
+
+def encode_cursor(value, pk: int) -> str:
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    raw = f'{value}{CURSOR_SEPARATOR}{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str, parse=parse_datetime):
+    """Возвращает пару (значение ключа, pk) или None для битого токена.
+
+    parse разбирает значение ключа: по умолчанию это дата.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        value, pk = raw.decode().split(CURSOR_SEPARATOR)
+        value = parse(value)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    if value is None:
+        return None
+    return value, pk
+
+
+def cache_is_shared(alias: str = DEFAULT_CACHE_ALIAS) -> bool:
+    """Видят ли записи в кэш alias другие процессы.
+
+    У LocMemCache кэш свой в каждом процессе: сброс или счётчик из
+    management-команды до веб-воркеров не доходит.
+    """
+    return not isinstance(caches[alias], LocMemCache)
+
+
+class CountedPaginator(Paginator):
+    """Paginator, которому число строк отдаёт внешний счётчик."""
+
+    def __init__(self, object_list, per_page, count=None, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_provider = count
+
+    @cached_property
+    def count(self):
+        if self.count_provider is None:
+            return super().count
+        return self.count_provider()
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (key, pk) без OFFSET и COUNT(*).
+
+    Страница N стоит столько же, сколько первая: выборка идёт от курсора
+    по индексу и берёт на одну запись больше, чтобы узнать о следующей.
+    """
+
+    cursor_mode = True
+    parse_key = staticmethod(parse_datetime)
+
+    def __init__(self, object_list, per_page, key='pub_date', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.key = key
+        self.cursor = None
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @property
+    def num_pages(self):
+        """Одна страница, плюс по одной на каждого известного соседа:
+        так has_next() и has_previous() у Page работают без COUNT(*)."""
+        return 1 + bool(self.previous_cursor) + bool(self.next_cursor)
+
+    def cursor_for(self, obj) -> str:
+        return encode_cursor(getattr(obj, self.key), obj.pk)
+
+    def decode(self, token):
+        """Пара (ключ, pk) из курсора; битый курсор — это 404, а не
+        молчаливый переход на первую страницу."""
+        if not token:
+            return None
+        cursor = decode_cursor(token, self.parse_key)
+        if cursor is None:
+            raise Http404
+        return cursor
+
+    def _fetch(self, after, before, queryset=None):
+        if queryset is None:
+            queryset = self.object_list
+        if before and not after:
+            value, pk = before
+            rows = list(
+                queryset.filter(
+                    Q(**{f'{self.key}__gt': value})
+                    | Q(**{self.key: value, 'pk__gt': pk})
+                ).order_by(self.key, 'pk')[: self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            return rows[: self.per_page][::-1], True, has_previous
+        if after:
+            value, pk = after
+            queryset = queryset.filter(
+                Q(**{f'{self.key}__lt': value})
+                | Q(**{self.key: value, 'pk__lt': pk})
+            )
+        rows = list(
+            queryset.order_by(f'-{self.key}', '-pk')[: self.per_page + 1]
+        )
+        return rows[: self.per_page], len(rows) > self.per_page, bool(after)
+
+    def get_cursor_page(self, after=None, before=None) -> Page:
+        """Отдаёт обычный Page, соседей которого описывают курсоры.
+
+        Номер страницы — 2, если есть предыдущая, иначе 1.
+        """
+        if after or before:
+            self.cursor = f'after={after}' if after else f'before={before}'
+        rows, has_next, has_previous = self._fetch(
+            self.decode(after), self.decode(before)
+        )
+        if rows and has_next:
+            self.next_cursor = self.cursor_for(rows[-1])
+        if rows and has_previous:
+            self.previous_cursor = self.cursor_for(rows[0])
+        number = 2 if self.previous_cursor else 1
+        return self._get_page(rows, number, self)
+
+
+class TieredCursorPaginator(CursorPaginator):
+    """Курсорный пагинатор по двум уровням: горячему object_list и
+    архиву archive, в котором все строки старше горячих.
+
+    Страницы берутся из горячего уровня, пока он не кончится, и только
+    страница на границе добирает строки из архива. Курсор архивной
+    строки помечен ARCHIVE_MARK: страницы в глубине архива не трогают
+    горячий уровень, а страницы горячего — архив.
+    """
+
+    def __init__(self, object_list, per_page, archive, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.archive = archive
+        self.in_archive = False
+
+    def cursor_for(self, obj) -> str:
+        cursor = super().cursor_for(obj)
+        if isinstance(obj, self.archive.model):
+            return ARCHIVE_MARK + cursor
+        return cursor
+
+    def get_cursor_page(self, after=None, before=None) -> Page:
+        self.in_archive = (after or before or '').startswith(ARCHIVE_MARK)
+        return super().get_cursor_page(
+            after and after.lstrip(ARCHIVE_MARK),
+            before and before.lstrip(ARCHIVE_MARK),
+        )
+
+    def _fetch(self, after, before, queryset=None):
+        fetch = super()._fetch
+        if before and not after:
+            if not self.in_archive:
+                return fetch(None, before)
+            rows, _, has_previous = fetch(None, before, self.archive)
+            if not has_previous:
+                # Более новые строки за границей архива — в горячем уровне.
+                newer, _, has_previous = fetch(None, before)
+                rows = newer + rows
+                has_previous = has_previous or len(rows) > self.per_page
+            first = max(len(rows) - self.per_page, 0)
+            return rows[first:], True, has_previous
+        if self.in_archive:
+            return fetch(after, None, self.archive)
+        rows, has_next, has_previous = fetch(after, None)
+        if has_next:
+            return rows, has_next, has_previous
+        if rows:
+            after = (getattr(rows[-1], self.key), rows[-1].pk)
+        older, has_next, _ = fetch(after, None, self.archive)
+        rows += older
+        has_next = has_next or len(rows) > self.per_page
+        return rows[: self.per_page], has_next, has_previous
+
 
-def paginate(request, posts, pagesize=PAGE_SIZE):
-    paginator = Paginator(posts, pagesize)
-    page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+def paginate(request, posts, pagesize=PAGE_SIZE, count=None, archive=None):
+    """Страница ленты: ?page= по номеру, иначе по курсору. Архив archive
+    доступен только курсорным страницам: номера страниц считаются по
+    горячему уровню."""
+    if 'page' in request.GET:
+        paginator = CountedPaginator(posts, pagesize, count=count)
+        return paginator.get_page(request.GET.get('page'))
+    if archive is not None:
+        paginator = TieredCursorPaginator(posts, pagesize, archive)
+    else:
+        paginator = CursorPaginator(posts, pagesize)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
@@ -1,4 +1,8 @@
 from django.shortcuts import render
+from django.views.static import serve
+
+from core.storage import is_content_addressed
+from yatube.settings import IMMUTABLE_CACHE_CONTROL
 
 
 def page_not_found(request, exception):
@@ -7,3 +11,16 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def media(request, path, document_root=None):
+    """Отдаёт медиафайл; файлы с хэшем в имени кэшируются навсегда.
+
+    Вью подключено только при DEBUG. В бою медиа отдаёт веб-сервер, и
+    заголовок IMMUTABLE_CACHE_CONTROL для путей с хэшем нужно настроить
+    в нём самом.
+    """
+    response = serve(request, path, document_root=document_root)
+    if response.status_code == 200 and is_content_addressed(path):
+        response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    return response
@@ -1,6 +1,14 @@
 from django.contrib import admin
 
-from posts.models import Comment, Follow, Group, Post
+from posts.forms import PostAdminForm
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    UserCounters,
+)
 
 
 @admin.register(Post)
@@ -17,6 +25,30 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    # Загрузки из админки проходят те же лимиты и пересохранение,
+    # что и из формы поста.
+    form = PostAdminForm
+
+
+@admin.register(ArchivedPost)
+class ArchivedPostAdmin(admin.ModelAdmin):
+    """Архив только для просмотра: у ArchivedPost нет сигналов, которые
+    сбрасывают кэш страниц, поисковый индекс и версии карточек, а
+    пишет в него одна команда archive_posts."""
+
+    list_display = ('pk', 'text', 'pub_date', 'author', 'group', 'image')
+    search_fields = ('text',)
+    list_filter = ('pub_date',)
+    empty_value_display = '-пусто-'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(Group)
@@ -34,7 +66,9 @@ class GroupAdmin(admin.ModelAdmin):
 
 @admin.register(Comment)
 class CommentAdmin(admin.ModelAdmin):
-    list_display = ('pk', 'created', 'text', 'post', 'author')
+    # Пост может лежать в архиве, и JOIN с горячей таблицей спрятал бы
+    # такие комментарии из списка.
+    list_display = ('pk', 'created', 'text', 'post_id', 'author')
     list_display_links = ('text',)
     search_fields = ('text',)
     list_filter = ('created',)
@@ -45,3 +79,9 @@ class CommentAdmin(admin.ModelAdmin):
 class FollowAdmin(admin.ModelAdmin):
     list_display = ('pk', 'user', 'author')
     list_filter = ('author',)
+
+
+@admin.register(UserCounters)
+class UserCountersAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts', 'following', 'followers', 'comments')
+    readonly_fields = ('posts', 'following', 'followers', 'comments')
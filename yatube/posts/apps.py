@@ -5,3 +5,6 @@ class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'пост'
     verbose_name_plural = 'посты'
+
+    def ready(self):
+        import posts.signals  # noqa: F401
@@ -0,0 +1,111 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.http import Http404
+from django.utils import timezone
+
+from core import page_cache
+from posts import counts, feeds, pages
+from posts.models import ArchivedPost, Follow, Post, TimelineEntry
+from posts.timeline import chunked
+from yatube.settings import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+COLUMNS = [field.attname for field in ArchivedPost._meta.concrete_fields]
+
+
+def get_post_or_404(pk: int, *related):
+    """Пост по pk: сначала из горячей таблицы, затем из архива."""
+    for model in (Post, ArchivedPost):
+        post = model.objects.select_related(*related).filter(pk=pk).first()
+        if post is not None:
+            return post
+    raise Http404
+
+
+def exists(pk: int) -> bool:
+    """Есть ли пост с pk в одном из уровней."""
+    return any(
+        model.objects.filter(pk=pk).exists() for model in (Post, ArchivedPost)
+    )
+
+
+def in_bulk(pks, *related) -> dict:
+    """{pk: пост} из обоих уровней; в архив идут только ненайденные."""
+    found = Post.objects.select_related(*related).in_bulk(pks)
+    missing = [pk for pk in pks if pk not in found]
+    if missing:
+        found.update(
+            ArchivedPost.objects.select_related(*related).in_bulk(missing)
+        )
+    return found
+
+
+def move(pks) -> list:
+    """Переносит посты в архив одной транзакцией, в обход сигналов.
+
+    Пост остаётся тем же для счётчиков, комментариев и поиска, поэтому
+    сигналы удаления Post не нужны. Записи лент подписчиков удаляются:
+    лента подписок заканчивается на границе архива.
+    """
+    with transaction.atomic():
+        rows = list(Post.objects.filter(pk__in=pks).values(*COLUMNS))
+        ArchivedPost.objects.bulk_create(
+            (ArchivedPost(**row) for row in rows), ignore_conflicts=True
+        )
+        TimelineEntry.objects.filter(post_id__in=pks).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Post._meta.db_table} WHERE id IN '
+                f'({", ".join(["%s"] * len(pks))})',
+                pks,
+            )
+    return rows
+
+
+def forget_pages(rows) -> None:
+    """Сбрасывает страницы и счётчики лент, из которых ушли посты."""
+    group_ids = {row['group_id'] for row in rows} - {None}
+    author_ids = {row['author_id'] for row in rows} - {None}
+    page_cache.purge(
+        pages.INDEX_PAGES,
+        *pages.group_pages(group_ids),
+        *pages.profile_pages(author_ids),
+    )
+    counts.forget_counts(
+        [
+            counts.count_key(counts.ALL),
+            *(counts.count_key(counts.GROUP, pk) for pk in group_ids),
+            *(counts.count_key(counts.AUTHOR, pk) for pk in author_ids),
+        ]
+    )
+    cache.delete_many([feeds.recent_key(pk) for pk in author_ids])
+    followers = (
+        Follow.objects.filter(author_id__in=author_ids)
+        .values_list('user_id', flat=True)
+        .distinct()
+        .iterator()
+    )
+    for chunk in chunked(followers):
+        counts.forget_counts(
+            [counts.count_key(counts.FOLLOWER, pk) for pk in chunk]
+        )
+
+
+def archive(days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH_SIZE):
+    """Переносит посты старше days дней пачками, от самых старых.
+
+    Отдаёт число перенесённых постов после каждой пачки.
+    """
+    old = (
+        Post.objects.filter(pub_date__lt=timezone.now() - timedelta(days))
+        .order_by('pub_date', 'pk')
+        .values_list('pk', flat=True)
+    )
+    while True:
+        pks = list(old[:batch_size])
+        if not pks:
+            return
+        rows = move(pks)
+        forget_pages(rows)
+        yield len(rows)
@@ -0,0 +1,97 @@
+from functools import reduce
+from operator import add
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Post,
+    User,
+    UserCounters,
+)
+
+RECOUNT_CHUNK_SIZE = 1000
+COUNTED = {
+    'posts': ((Post, ArchivedPost), 'author'),
+    'following': ((Follow,), 'user'),
+    'followers': ((Follow,), 'author'),
+    'comments': ((Comment,), 'author'),
+}
+
+
+def bump(user_id, field: str, delta: int) -> None:
+    """Сдвигает счётчик пользователя атомарным UPDATE ... SET f = f + d.
+
+    Значение не опускается ниже нуля: счётчик, разошедшийся с базой после
+    bulk_create (например, при импорте до recount), не должен мешать
+    удалить пост из-за CHECK-ограничения.
+
+    Строки счётчиков нет у пользователей, созданных в обход сигналов:
+    при росте она пересчитывается целиком, при удалении (в том числе
+    каскадном вместе с пользователем) пропускается.
+    """
+    if user_id is None:
+        return
+    updated = UserCounters.objects.filter(user_id=user_id).update(
+        **{field: Greatest(F(field) + delta, 0)}
+    )
+    if not updated and delta > 0:
+        recount(User.objects.filter(pk=user_id))
+
+
+def count_subquery(model, user_field: str):
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{user_field: OuterRef('pk')})
+            .order_by()
+            .values(user_field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount(users=None, chunk_size: int = RECOUNT_CHUNK_SIZE) -> int:
+    """Пересчитывает счётчики пачками пользователей, возвращает их число."""
+    users = (users if users is not None else User.objects.all()).order_by('pk')
+    annotated = users.annotate(
+        **{
+            f'{field}_total': reduce(
+                add,
+                (count_subquery(model, user_field) for model in models),
+            )
+            for field, (models, user_field) in COUNTED.items()
+        }
+    ).values('pk', *(f'{field}_total' for field in COUNTED))
+    total = 0
+    last_pk = 0
+    while True:
+        rows = list(annotated.filter(pk__gt=last_pk)[:chunk_size])
+        if not rows:
+            return total
+        counters = [
+            UserCounters(
+                user_id=row['pk'],
+                **{field: row[f'{field}_total'] for field in COUNTED},
+            )
+            for row in rows
+        ]
+        existing = set(
+            UserCounters.objects.filter(
+                user_id__in=[row['pk'] for row in rows]
+            ).values_list('user_id', flat=True)
+        )
+        UserCounters.objects.bulk_update(
+            [item for item in counters if item.user_id in existing],
+            list(COUNTED),
+        )
+        UserCounters.objects.bulk_create(
+            [item for item in counters if item.user_id not in existing]
+        )
+        total += len(rows)
+        last_pk = rows[-1]['pk']
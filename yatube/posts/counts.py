@@ -0,0 +1,97 @@
+from django.core.cache import cache
+
+from yatube.settings import (
+    COUNT_CACHE_TIMEOUT,
+    COUNT_SHIFT_THRESHOLD,
+    COUNT_SHIFT_TIMEOUT,
+)
+
+COUNT_KEY = 'posts:count:{}:{}'
+ALL = 'all'
+GROUP = 'group'
+AUTHOR = 'author'
+FOLLOWER = 'follower'
+
+
+def count_key(scope: str, pk=None) -> str:
+    return COUNT_KEY.format(scope, pk)
+
+
+def estimate_count(queryset) -> int:
+    """Количество строк ленты, точное только до COUNT_SHIFT_THRESHOLD.
+
+    COUNT(*) ограничен THRESHOLD + 1 строками. Если лента длиннее,
+    число экстраполируется по темпу публикаций: последние THRESHOLD
+    строк заняли отрезок от граничной даты до самой свежей, остальная
+    лента пишется с тем же темпом. Даты берутся из индексов по
+    pub_date, так что оценка стоит ещё три коротких запроса.
+    """
+    count = queryset.order_by()[: COUNT_SHIFT_THRESHOLD + 1].count()
+    if count <= COUNT_SHIFT_THRESHOLD:
+        return count
+    dates = queryset.order_by('-pub_date').values_list('pub_date', flat=True)
+    newest = dates[0]
+    boundary = dates[COUNT_SHIFT_THRESHOLD]
+    oldest = dates.reverse()[0]
+    recent = (newest - boundary).total_seconds()
+    if not recent:
+        # Все последние строки в одну секунду: темп не определить.
+        return queryset.count()
+    estimate = COUNT_SHIFT_THRESHOLD * (newest - oldest).total_seconds()
+    return max(round(estimate / recent), count)
+
+
+def cached_count(queryset, scope: str, pk=None) -> int:
+    """Количество строк ленты из кэша, оценка только при промахе.
+
+    Маленькие счётчики точные, их сбрасывают сигналы Post. Счётчики выше
+    COUNT_SHIFT_THRESHOLD оцениваются estimate_count, живут
+    COUNT_SHIFT_TIMEOUT и только сдвигаются на ±1, поэтому до истечения
+    расходятся с базой на погрешность оценки.
+    """
+    key = count_key(scope, pk)
+    count = cache.get(key)
+    if count is None:
+        count = estimate_count(queryset)
+        timeout = (
+            COUNT_SHIFT_TIMEOUT
+            if count > COUNT_SHIFT_THRESHOLD
+            else COUNT_CACHE_TIMEOUT
+        )
+        cache.set(key, count, timeout)
+    return count
+
+
+def post_count_keys(post, follower_ids=()) -> list:
+    return [
+        count_key(ALL),
+        count_key(GROUP, post.group_id),
+        count_key(AUTHOR, post.author_id),
+        *(count_key(FOLLOWER, user_id) for user_id in follower_ids),
+    ]
+
+
+def shift_counts(keys, delta: int) -> None:
+    """Сдвигает большие счётчики, точные просто сбрасывает."""
+    stale = []
+    for key, count in cache.get_many(keys).items():
+        if count <= COUNT_SHIFT_THRESHOLD:
+            stale.append(key)
+            continue
+        try:
+            cache.incr(key, delta)
+        except ValueError:
+            # Ключ истёк между get_many и incr: пересчитается при чтении.
+            stale.append(key)
+    cache.delete_many(stale)
+
+
+def forget_counts(keys) -> None:
+    """Сбрасывает точные счётчики, большие оставляет как есть."""
+    cache.delete_many(
+        [
+            key
+            for key, count in cache.get_many(keys).items()
+            if count <= COUNT_SHIFT_THRESHOLD
+        ]
+    )
@@ -0,0 +1,178 @@
+import heapq
+from collections import deque
+from functools import partial
+from itertools import islice, takewhile
+
+from django.core.cache import cache
+
+from core.utils import CursorPaginator, paginate
+from posts import counts
+from posts.models import Follow, Post
+from posts.timeline import chunked
+from yatube.settings import (
+    FOLLOW_FEED_ENGINE,
+    FOLLOW_FEED_RECENT_LIMIT,
+    FOLLOW_FEED_RECENT_TIMEOUT,
+    PAGE_SIZE,
+)
+
+RECENT_KEY = 'posts:recent:{}'
+RECENT_CHUNK_SIZE = 500
+RECENT_SQL = (
+    'SELECT id, author_id, pub_date FROM ('
+    'SELECT id, author_id, pub_date, ROW_NUMBER() OVER ('
+    'PARTITION BY author_id ORDER BY pub_date DESC, id DESC) AS position '
+    'FROM {table} WHERE author_id IN ({ids})) AS ranked WHERE position <= %s'
+)
+
+
+def recent_key(author_id) -> str:
+    return RECENT_KEY.format(author_id)
+
+
+def load_recent(author_ids) -> dict:
+    """Последние посты авторов одним запросом на RECENT_CHUNK_SIZE
+    авторов: ROW_NUMBER() отрезает FOLLOW_FEED_RECENT_LIMIT постов
+    каждого автора прямо в базе."""
+    recent = {author_id: [] for author_id in author_ids}
+    for chunk in chunked(list(recent), RECENT_CHUNK_SIZE):
+        sql = RECENT_SQL.format(
+            table=Post._meta.db_table, ids=', '.join(['%s'] * len(chunk))
+        )
+        for post in Post.objects.raw(sql, [*chunk, FOLLOW_FEED_RECENT_LIMIT]):
+            recent[post.author_id].append((post.pub_date, post.pk))
+    for items in recent.values():
+        items.sort(reverse=True)
+    return recent
+
+
+def recent_posts(author_ids) -> dict:
+    """Последние FOLLOW_FEED_RECENT_LIMIT пар (pub_date, pk) каждого автора,
+    от новых к старым. Промахи кэша добираются общим запросом и сразу
+    кладутся обратно."""
+    keys = {recent_key(author_id): author_id for author_id in author_ids}
+    found = cache.get_many(keys)
+    missing = [
+        author_id for key, author_id in keys.items() if key not in found
+    ]
+    if missing:
+        loaded = {
+            recent_key(author_id): items
+            for author_id, items in load_recent(missing).items()
+        }
+        cache.set_many(loaded, FOLLOW_FEED_RECENT_TIMEOUT)
+        found.update(loaded)
+    return {keys[key]: items for key, items in found.items()}
+
+
+def forget_post(post) -> None:
+    cache.delete(recent_key(post.author_id))
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """Курсорный пагинатор, который собирает страницу k-way слиянием
+    списков последних постов авторов и догружает только её посты.
+
+    Обрезанный список автора делает слияние достоверным лишь до его
+    последнего элемента (горизонта). Страницы за горизонтом отдаёт
+    обычный SQL-запрос из object_list с теми же курсорами.
+    """
+
+    def __init__(self, object_list, per_page, recent, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.recent = recent
+        truncated = [
+            items[-1]
+            for items in recent.values()
+            if len(items) >= FOLLOW_FEED_RECENT_LIMIT
+        ]
+        self.horizon = max(truncated) if truncated else None
+
+    def merged(self):
+        stream = heapq.merge(*self.recent.values(), reverse=True)
+        if self.horizon is None:
+            return stream
+        return takewhile(lambda item: item >= self.horizon, stream)
+
+    def hydrate(self, keys) -> list:
+        posts = Post.objects.select_related('author', 'group').in_bulk(
+            [pk for _, pk in keys]
+        )
+        return [posts[pk] for _, pk in keys if pk in posts]
+
+    def _fetch(self, after, before):
+        if before and not after:
+            if self.horizon is not None and before < self.horizon:
+                return super()._fetch(after, before)
+            newer = deque(
+                takewhile(lambda item: item > before, self.merged()),
+                maxlen=self.per_page + 1,
+            )
+            has_previous = len(newer) > self.per_page
+            keys = list(newer)[1:] if has_previous else list(newer)
+            return self.hydrate(keys), True, has_previous
+        stream = self.merged()
+        if after:
+            stream = (item for item in stream if item < after)
+        keys = list(islice(stream, self.per_page + 1))
+        if len(keys) <= self.per_page and self.horizon is not None:
+            return super()._fetch(after, before)
+        has_next = len(keys) > self.per_page
+        return self.hydrate(keys[: self.per_page]), has_next, bool(after)
+
+
+def join_feed(request):
+    post_list = Post.objects.select_related('author', 'group').filter(
+        author__following__user=request.user
+    )
+    return paginate(
+        request,
+        post_list,
+        count=partial(
+            counts.cached_count, post_list, counts.FOLLOWER, request.user.pk
+        ),
+    )
+
+
+def timeline_feed(request):
+    entries = request.user.timeline.select_related(
+        'post__author', 'post__group'
+    )
+    page_obj = paginate(
+        request,
+        entries,
+        count=partial(
+            counts.cached_count, entries, counts.FOLLOWER, request.user.pk
+        ),
+    )
+    page_obj.object_list = [entry.post for entry in page_obj]
+    return page_obj
+
+
+def merge_feed(request):
+    if 'page' in request.GET:
+        return join_feed(request)
+    author_ids = Follow.objects.filter(user=request.user).values_list(
+        'author_id', flat=True
+    )
+    paginator = MergedCursorPaginator(
+        Post.objects.select_related('author', 'group').filter(
+            author__following__user=request.user
+        ),
+        PAGE_SIZE,
+        recent_posts(author_ids),
+    )
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'), before=request.GET.get('before')
+    )
+
+
+FOLLOW_FEEDS = {
+    'join': join_feed,
+    'timeline': timeline_feed,
+    'merge': merge_feed,
+}
+
+
+def follow_feed(request, engine=FOLLOW_FEED_ENGINE):
+    return FOLLOW_FEEDS[engine](request)
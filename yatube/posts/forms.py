@@ -1,14 +1,42 @@
 from django import forms
 
+from posts import uploads
 from posts.models import Comment, Post
 
 
-class PostForm(forms.ModelForm):
+class ImageUploadMixin:
+    """Лимиты и пересохранение картинки поста. Обработчик загрузки режет
+    большие файлы для всего сайта, поэтому эта обработка стоит везде,
+    где картинку можно загрузить: в PostForm и в админке."""
+
+    def clean_image(self):
+        image, bytes_saved = uploads.check_image(self.cleaned_data['image'])
+        if bytes_saved is not None:
+            self.instance.image_bytes_saved = bytes_saved
+        return image
+
+    def clean(self):
+        # Обрезанный обработчиком загрузки файл ImageField считает битым:
+        # заменяем это сообщение настоящей причиной.
+        error = uploads.oversized_error(self.files.get('image'))
+        if error is not None:
+            self.errors.pop('image', None)
+            self.add_error('image', error)
+        return super().clean()
+
+
+class PostForm(ImageUploadMixin, forms.ModelForm):
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
 
 
+class PostAdminForm(ImageUploadMixin, forms.ModelForm):
+    class Meta:
+        model = Post
+        fields = '__all__'
+
+
 class CommentForm(forms.ModelForm):
     class Meta:
         model = Comment
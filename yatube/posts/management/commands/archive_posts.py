@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.utils import LOCAL_CACHE_WARNING, cache_is_shared
+from posts import archive
+from yatube.settings import ARCHIVE_AFTER_DAYS, ARCHIVE_BATCH_SIZE
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит посты старше --days дней из горячей таблицы в архивную. '
+        'Страницы постов, профили и глубокие страницы лент продолжают их '
+        'показывать.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER_DAYS)
+        parser.add_argument(
+            '--batch-size', type=int, default=ARCHIVE_BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = 0
+        for moved in archive.archive(options['days'], options['batch_size']):
+            total += moved
+            if options['verbosity'] > 1:
+                self.stdout.write(f'Перенесено постов: {total}')
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'В архиве постов: {total}, {total / elapsed:.0f} в секунду'
+            )
+        )
+        if total and not cache_is_shared():
+            self.stdout.write(self.style.WARNING(LOCAL_CACHE_WARNING))
@@ -0,0 +1,59 @@
+import logging
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts.models import Post
+from posts.uploads import image_metadata
+
+CHUNK_SIZE = 200
+FIELDS = ('image_width', 'image_height', 'image_placeholder')
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет размеры и заглушку картинки у постов, загруженных до '
+        'появления этих полей.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        posts = (
+            Post.objects.exclude(image='')
+            .filter(image_width__isnull=True)
+            .only('pk', 'image')
+            .order_by('pk')
+        )
+        last_pk = done = failed = 0
+        while True:
+            chunk = list(posts.filter(pk__gt=last_pk)[: options['chunk_size']])
+            if not chunk:
+                break
+            filled = []
+            for post in chunk:
+                try:
+                    (
+                        post.image_width,
+                        post.image_height,
+                        post.image_placeholder,
+                    ) = image_metadata(post.image)
+                except Exception:
+                    logger.exception('Не удалось прочитать %s', post.image)
+                    failed += 1
+                    continue
+                finally:
+                    post.image.close()
+                filled.append(post)
+            Post.objects.bulk_update(filled, FIELDS)
+            Post.objects.filter(pk__in=[post.pk for post in filled]).update(
+                card_version=F('card_version') + 1
+            )
+            done += len(filled)
+            last_pk = chunk[-1].pk
+        self.stdout.write(
+            self.style.SUCCESS(f'Заполнено постов: {done}, ошибок: {failed}')
+        )
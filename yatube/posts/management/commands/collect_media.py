@@ -0,0 +1,182 @@
+import os
+import shutil
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from sorl.thumbnail import default
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts import thumbnails
+from posts.models import ArchivedPost, Post
+from posts.timeline import chunked
+from yatube.settings import UPLOAD_TO
+
+BATCH_SIZE = 1000
+MIN_AGE = 60 * 60 * 24
+
+
+def old_files(root: str, cutoff: float):
+    """Файлы дерева старше cutoff, без чтения каталогов целиком."""
+    if not os.path.isdir(root):
+        return
+    directories = [root]
+    while directories:
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    directories.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    if stat.st_mtime < cutoff:
+                        yield entry.path, stat.st_size
+
+
+def media_name(path: str, storage) -> str:
+    return os.path.relpath(path, storage.location).replace(os.sep, '/')
+
+
+class Command(BaseCommand):
+    help = (
+        'Находит картинки, на которые не ссылается ни один пост, и их '
+        'миниатюры. Без --delete или --quarantine только считает.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument(
+            '--min-age',
+            type=int,
+            default=MIN_AGE,
+            help=(
+                'Не трогать файлы моложе стольких секунд: загрузка могла '
+                'ещё не попасть в базу.'
+            ),
+        )
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--delete', action='store_true')
+        action.add_argument(
+            '--quarantine',
+            type=Path,
+            help='Каталог, куда переносятся файлы вместо удаления.',
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.storage = Post._meta.get_field('image').storage
+        self.removed = {'originals': [0, 0], 'thumbnails': [0, 0]}
+        cutoff = time.time() - options['min_age']
+        for batch in chunked(
+            old_files(self.storage.path(UPLOAD_TO), cutoff),
+            options['batch_size'],
+        ):
+            self.collect_originals(dict(batch))
+        if thumbnails.kvstore_is_cached_db():
+            for batch in chunked(
+                old_files(
+                    default.storage.path(thumbnail_settings.THUMBNAIL_PREFIX),
+                    cutoff,
+                ),
+                options['batch_size'],
+            ):
+                self.collect_thumbnails(dict(batch))
+        else:
+            self.stdout.write(
+                self.style.WARNING(
+                    'kvstore sorl не cached_db: миниатюры без записей '
+                    'не ищутся.'
+                )
+            )
+        originals, original_bytes = self.removed['originals']
+        thumbnail_count, thumbnail_bytes = self.removed['thumbnails']
+        verb = 'Освобождено' if self.acting else 'Можно освободить'
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Оригиналов: {originals}, миниатюр: {thumbnail_count}. '
+                f'{verb}: '
+                f'{filesizeformat(original_bytes + thumbnail_bytes)}'
+            )
+        )
+
+    def collect_originals(self, sizes: dict) -> None:
+        names = {media_name(path, self.storage): path for path in sizes}
+        referenced = {
+            image
+            for model in (Post, ArchivedPost)
+            for image in model.objects.filter(image__in=names).values_list(
+                'image', flat=True
+            )
+        }
+        for name, path in names.items():
+            if name not in referenced:
+                self.collect_source_thumbnails(name)
+                self.remove('originals', path, sizes[path])
+
+    def collect_source_thumbnails(self, name: str) -> None:
+        """Миниатюры картинки и их записи в kvstore sorl.
+
+        Миниатюры берутся из списка, который sorl ведёт для источника, и
+        уходят через remove(), как и остальные файлы: kvstore.delete()
+        вызывается с delete_thumbnails=False, иначе sorl сам удалил бы
+        файлы мимо карантина и отчёта. Файлы, о которых kvstore не знает,
+        соберёт collect_thumbnails.
+        """
+        kvstore = default.kvstore
+        source = ImageFile(name, self.storage)
+        for key in kvstore._get(source.key, identity='thumbnails') or []:
+            thumbnail = kvstore._get(key)
+            if thumbnail is None:
+                continue
+            if thumbnail.exists():
+                path = default.storage.path(thumbnail.name)
+                self.remove('thumbnails', path, os.path.getsize(path))
+            if self.acting:
+                kvstore.delete(thumbnail, delete_thumbnails=False)
+        if self.acting:
+            kvstore._delete(source.key, identity='thumbnails')
+            kvstore.delete(source, delete_thumbnails=False)
+
+    def collect_thumbnails(self, sizes: dict) -> None:
+        """Файлы миниатюр, о которых kvstore ничего не знает.
+
+        Записи читаются прямо из таблицы cached_db kvstore, поэтому handle
+        вызывает этот проход только для него: с другим kvstore все файлы
+        выглядели бы незарегистрированными.
+        """
+        keys = {
+            add_prefix(
+                ImageFile(
+                    media_name(path, default.storage), default.storage
+                ).key
+            ): path
+            for path in sizes
+        }
+        registered = set(
+            KVStoreModel.objects.filter(key__in=keys).values_list(
+                'key', flat=True
+            )
+        )
+        for key, path in keys.items():
+            if key not in registered:
+                self.remove('thumbnails', path, sizes[path])
+
+    @property
+    def acting(self) -> bool:
+        return self.options['delete'] or bool(self.options['quarantine'])
+
+    def remove(self, kind: str, path: str, size: int) -> None:
+        quarantine = self.options['quarantine']
+        if quarantine:
+            target = quarantine / media_name(path, default.storage)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(path, target)
+        elif self.options['delete']:
+            os.remove(path)
+        self.removed[kind][0] += 1
+        self.removed[kind][1] += size
+        if self.options['verbosity'] > 1:
+            self.stdout.write(path)
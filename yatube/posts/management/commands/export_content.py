@@ -0,0 +1,37 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает группы, посты, комментарии и подписки в '
+        'каталог, по файлу JSONL или CSV на модель.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=Path)
+        parser.add_argument(
+            '--format', choices=transfer.FORMATS, default='jsonl'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        directory.mkdir(parents=True, exist_ok=True)
+        fmt = options['format']
+        for name in transfer.SECTIONS:
+            started = time.monotonic()
+            with open(
+                directory / f'{name}.{fmt}', 'w', encoding='utf-8', newline=''
+            ) as stream:
+                total = transfer.export_rows(
+                    name, stream, fmt, options['batch_size']
+                )
+            self.stdout.write(transfer.summary(name, total, started))
+        self.stdout.write(self.style.SUCCESS(f'Выгружено в {directory}'))
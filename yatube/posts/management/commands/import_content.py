@@ -0,0 +1,65 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.utils import LOCAL_CACHE_WARNING, cache_is_shared
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково загружает выгрузку export_content пачками bulk_create. '
+        'Уже загруженные строки пропускаются; после загрузки '
+        'пересчитываются счётчики, ленты и поисковый индекс.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=Path)
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE
+        )
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not directory.is_dir():
+            raise CommandError(f'Нет каталога {directory}')
+        maps = transfer.key_maps()
+        for name in transfer.SECTIONS:
+            for fmt in transfer.FORMATS:
+                path = directory / f'{name}.{fmt}'
+                if path.exists():
+                    try:
+                        self.load(name, path, fmt, maps, options)
+                    except transfer.ConflictError as error:
+                        raise CommandError(error)
+                    break
+        if maps['users'].created:
+            self.stdout.write(
+                f'Заведено пользователей без пароля: {maps["users"].created}'
+            )
+        transfer.rebuild_derived()
+        self.stdout.write(
+            self.style.SUCCESS(
+                'Счётчики, ленты и поисковый индекс пересчитаны'
+            )
+        )
+        if not cache_is_shared():
+            self.stdout.write(self.style.WARNING(LOCAL_CACHE_WARNING))
+
+    def load(self, name, path, fmt, maps, options):
+        started = time.monotonic()
+
+        def progress(total):
+            if options['verbosity'] > 1:
+                self.stdout.write(transfer.summary(name, total, started))
+
+        with open(path, encoding='utf-8', newline='') as stream:
+            total = transfer.import_rows(
+                name,
+                transfer.read_rows(stream, fmt),
+                maps,
+                options['batch_size'],
+                progress,
+            )
+        self.stdout.write(transfer.summary(name, total, started))
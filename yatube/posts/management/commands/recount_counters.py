@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import RECOUNT_CHUNK_SIZE, recount
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает денормализованные счётчики пользователей.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=RECOUNT_CHUNK_SIZE,
+            help='Сколько пользователей пересчитывать за один запрос.',
+        )
+
+    def handle(self, *args, **options):
+        total = recount(chunk_size=options['chunk_size'])
+        self.stdout.write(
+            self.style.SUCCESS(f'Пересчитаны счётчики {total} пользователей')
+        )
@@ -0,0 +1,110 @@
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from posts import pages
+from posts.models import Post
+from posts.thumbnails import generate_variants
+from yatube.settings import THUMBNAIL_CHECKPOINT
+
+CHUNK_SIZE = 200
+
+logger = logging.getLogger(__name__)
+
+
+def warm(image_name: str) -> bool:
+    try:
+        generate_variants(image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image_name)
+        return False
+    return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Заранее создаёт миниатюры всех пресетов для постов с картинками. '
+        'Прогресс сохраняется, прерванный запуск продолжается с места '
+        'остановки.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count(),
+            help='Число процессов, по умолчанию по числу CPU.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+        parser.add_argument(
+            '--checkpoint',
+            type=Path,
+            default=THUMBNAIL_CHECKPOINT,
+            help='Файл с pk последнего обработанного поста.',
+        )
+        parser.add_argument(
+            '--restart',
+            action='store_true',
+            help='Начать сначала, не глядя на сохранённый прогресс.',
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_pk = 0
+        if checkpoint.exists() and not options['restart']:
+            last_pk = int(checkpoint.read_text() or 0)
+            self.stdout.write(f'Продолжаем после поста {last_pk}')
+        posts = (
+            Post.objects.exclude(image='')
+            .order_by('pk')
+            .values_list('pk', 'image')
+        )
+        done = failed = 0
+        started = time.monotonic()
+        # spawn, а не fork: дочерние процессы не наследуют соединения с БД
+        # и сами настраивают Django.
+        with ProcessPoolExecutor(
+            max_workers=options['workers'],
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        ) as pool:
+            while True:
+                chunk = list(
+                    posts.filter(pk__gt=last_pk)[: options['chunk_size']]
+                )
+                if not chunk:
+                    break
+                images = {image for _, image in chunk}
+                results = list(pool.map(warm, images))
+                done += results.count(True)
+                failed += results.count(False)
+                post_ids = [pk for pk, _ in chunk]
+                Post.objects.filter(pk__in=post_ids).update(
+                    card_version=F('card_version') + 1
+                )
+                # Кэш анонимных страниц хранит HTML со старыми карточками.
+                pages.purge_posts(post_ids)
+                last_pk = chunk[-1][0]
+                checkpoint.write_text(str(last_pk))
+                elapsed = time.monotonic() - started
+                self.stdout.write(
+                    f'Пост {last_pk}: {done} картинок, '
+                    f'{done / elapsed:.1f} картинок/с'
+                )
+        if checkpoint.exists():
+            checkpoint.unlink()
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Готово: {done} картинок за {elapsed:.1f} с '
+                f'({done / elapsed if elapsed else 0:.1f} картинок/с), '
+                f'ошибок: {failed}'
+            )
+        )
@@ -0,0 +1,112 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:12
+
+import django.db.models.deletion
+import django.db.models.expressions
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_counters(apps, schema_editor):
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserCounters = apps.get_model('posts', 'UserCounters')
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Follow = apps.get_model('posts', 'Follow')
+    totals = {}
+    for field, model, user_field in (
+        ('posts', Post, 'author'),
+        ('following', Follow, 'user'),
+        ('followers', Follow, 'author'),
+        ('comments', Comment, 'author'),
+    ):
+        rows = (
+            model.objects.exclude(**{user_field: None})
+            .order_by()
+            .values_list(user_field)
+            .annotate(total=models.Count('pk'))
+        )
+        for user_id, total in rows:
+            totals.setdefault(user_id, {})[field] = total
+    UserCounters.objects.bulk_create(
+        UserCounters(user_id=user_id, **totals.get(user_id, {}))
+        for user_id in User.objects.values_list('pk', flat=True).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0007_auto_20230410_1325'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserCounters',
+            fields=[
+                (
+                    'user',
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name='counters',
+                        serialize=False,
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='пользователь',
+                    ),
+                ),
+                (
+                    'posts',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='статьи'
+                    ),
+                ),
+                (
+                    'following',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='подписки'
+                    ),
+                ),
+                (
+                    'followers',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='подписчики'
+                    ),
+                ),
+                (
+                    'comments',
+                    models.PositiveIntegerField(
+                        default=0, verbose_name='комментарии'
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'счётчики пользователя',
+                'verbose_name_plural': 'счётчики пользователей',
+            },
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(
+                blank=True, upload_to='posts/', verbose_name='картинка'
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.CheckConstraint(
+                check=models.Q(
+                    _negated=True,
+                    user=django.db.models.expressions.F('author'),
+                ),
+                name='user_author_check',
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(
+                fields=('user', 'author'), name='unique_following'
+            ),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+import core.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_card_version'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(
+                blank=True,
+                storage=core.storage.ContentAddressedStorage(),
+                upload_to='posts/',
+                verbose_name='картинка',
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_bytes_saved',
+            field=models.IntegerField(
+                default=0,
+                editable=False,
+                verbose_name='сэкономлено байт при загрузке',
+            ),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+TABLES = (
+    ('posts_post_fts', 'text', 'rowid, text', 'id, text FROM posts_post'),
+    (
+        'posts_comment_fts',
+        'text, post_id UNINDEXED',
+        'rowid, text, post_id',
+        'id, text, post_id FROM posts_comment',
+    ),
+)
+
+
+def create_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, columns, insert, select in TABLES:
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {table} USING fts5({columns}, '
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        schema_editor.execute(f'INSERT INTO {table}({insert}) SELECT {select}')
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for table, *_ in TABLES:
+        schema_editor.execute(f'DROP TABLE {table}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
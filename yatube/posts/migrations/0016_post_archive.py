@@ -0,0 +1,147 @@
+# Generated by Django 2.2.16 on 2026-10-18 03:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import core.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0015_search_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.ForeignKey(
+                db_constraint=False,
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name='comments',
+                to='posts.Post',
+                verbose_name='пост',
+            ),
+        ),
+        migrations.CreateModel(
+            name='ArchivedPost',
+            fields=[
+                ('text', models.TextField(verbose_name='текст')),
+                (
+                    'image',
+                    models.ImageField(
+                        blank=True,
+                        storage=core.storage.ContentAddressedStorage(),
+                        upload_to='posts/',
+                        verbose_name='картинка',
+                    ),
+                ),
+                (
+                    'image_width',
+                    models.PositiveIntegerField(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        verbose_name='ширина картинки',
+                    ),
+                ),
+                (
+                    'image_height',
+                    models.PositiveIntegerField(
+                        blank=True,
+                        editable=False,
+                        null=True,
+                        verbose_name='высота картинки',
+                    ),
+                ),
+                (
+                    'image_placeholder',
+                    models.TextField(
+                        blank=True,
+                        editable=False,
+                        verbose_name='заглушка картинки',
+                    ),
+                ),
+                (
+                    'image_bytes_saved',
+                    models.IntegerField(
+                        default=0,
+                        editable=False,
+                        verbose_name='сэкономлено байт при загрузке',
+                    ),
+                ),
+                (
+                    'card_version',
+                    models.PositiveIntegerField(
+                        default=0,
+                        editable=False,
+                        verbose_name='версия карточки',
+                    ),
+                ),
+                (
+                    'id',
+                    models.IntegerField(
+                        primary_key=True, serialize=False, verbose_name='ID'
+                    ),
+                ),
+                (
+                    'pub_date',
+                    models.DateTimeField(verbose_name='дата публикации'),
+                ),
+                (
+                    'author',
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='archived_posts',
+                        to=settings.AUTH_USER_MODEL,
+                        verbose_name='автор',
+                    ),
+                ),
+                (
+                    'group',
+                    models.ForeignKey(
+                        blank=True,
+                        db_index=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name='archived_posts',
+                        to='posts.Group',
+                        verbose_name='группа',
+                    ),
+                ),
+            ],
+            options={
+                'verbose_name': 'архивная статья',
+                'verbose_name_plural': 'архивные статьи',
+                'ordering': ('-pub_date',),
+                'default_related_name': 'archived_posts',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                fields=['-pub_date', '-id'], name='archived_pub_date_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='archived_author_pub_date_idx',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='archivedpost',
+            index=models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='archived_group_pub_date_idx',
+            ),
+        ),
+    ]
@@ -1,11 +1,26 @@
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
 
+from core.storage import ContentAddressedStorage
 from yatube.settings import UPLOAD_TO
 
 User = get_user_model()
 TEXT_SIZE = 15
 MY_FOLLOW = '{} подписан на {}'
+MY_COUNTERS = 'счётчики {}'
+MY_TIMELINE = 'лента {}: статья {}'
+
+
+class AtomicSaveModel(models.Model):
+    """Сохраняет запись и всё, что делают post_save-сигналы, одной
+    транзакцией: денормализованные счётчики не расходятся с данными."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 
 class Group(models.Model):
@@ -26,18 +41,23 @@ class Group(models.Model):
         return self.title[:TEXT_SIZE]
 
 
-class Post(models.Model):
+class PostFields(AtomicSaveModel):
+    """Поля поста, общие для горячей таблицы и архива."""
+
     text = models.TextField(verbose_name='текст')
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='дата публикации',
         db_index=True,
     )
+    # Отдельные индексы внешних ключей не нужны: их покрывают составные
+    # индексы из Meta, где ключ стоит первым.
     group = models.ForeignKey(
         Group,
         blank=True,
         null=True,
         on_delete=models.SET_NULL,
+        db_index=False,
         verbose_name='группа',
     )
     author = models.ForeignKey(
@@ -45,29 +65,111 @@ class Post(models.Model):
         on_delete=models.CASCADE,
         blank=True,
         null=True,
+        db_index=False,
         verbose_name='автор',
     )
     image = models.ImageField(
         verbose_name='картинка',
         upload_to=UPLOAD_TO,
+        storage=ContentAddressedStorage(),
         blank=True,
     )
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='ширина картинки',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='высота картинки',
+    )
+    image_placeholder = models.TextField(
+        blank=True,
+        editable=False,
+        verbose_name='заглушка картинки',
+    )
+    image_bytes_saved = models.IntegerField(
+        default=0,
+        editable=False,
+        verbose_name='сэкономлено байт при загрузке',
+    )
+    card_version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='версия карточки',
+    )
+
+    archived = False
 
+    class Meta:
+        abstract = True
+
+    def __str__(self) -> str:
+        return self.text[:TEXT_SIZE]
+
+
+class Post(PostFields):
     class Meta:
         ordering = ('-pub_date',)
         default_related_name = 'posts'
         verbose_name = 'статья'
         verbose_name_plural = 'статьи'
+        indexes = [
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='post_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='post_group_pub_date_idx',
+            ),
+        ]
 
-    def __str__(self) -> str:
-        return self.text[:TEXT_SIZE]
 
+class ArchivedPost(PostFields):
+    """Пост старше ARCHIVE_AFTER_DAYS, перенесённый командой
+    archive_posts. pk остаётся прежним, поэтому ссылки, комментарии и
+    поисковый индекс продолжают работать, а горячая таблица и её индексы
+    не растут с годами."""
+
+    id = models.IntegerField(primary_key=True, verbose_name='ID')
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    archived = True
+
+    class Meta:
+        ordering = ('-pub_date',)
+        default_related_name = 'archived_posts'
+        verbose_name = 'архивная статья'
+        verbose_name_plural = 'архивные статьи'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='archived_pub_date_idx',
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='archived_author_pub_date_idx',
+            ),
+            models.Index(
+                fields=('group', '-pub_date', '-id'),
+                name='archived_group_pub_date_idx',
+            ),
+        ]
 
-class Comment(models.Model):
+
+class Comment(AtomicSaveModel):
+    # Комментарии архивного поста остаются здесь, а сам пост переезжает
+    # в ArchivedPost, поэтому внешнего ключа на уровне базы нет.
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
         related_name='comments',
+        db_index=False,
+        db_constraint=False,
         verbose_name='пост',
     )
     author = models.ForeignKey(
@@ -87,12 +189,18 @@ class Comment(models.Model):
         ordering = ('-created',)
         verbose_name = 'комментарий'
         verbose_name_plural = 'комментарии'
+        indexes = [
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:TEXT_SIZE]
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -121,3 +229,63 @@ class Follow(models.Model):
 
     def __str__(self):
         return MY_FOLLOW.format(self.user.username, self.author.username)
+
+
+class UserCounters(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='counters',
+        verbose_name='пользователь',
+    )
+    posts = models.PositiveIntegerField(default=0, verbose_name='статьи')
+    following = models.PositiveIntegerField(default=0, verbose_name='подписки')
+    followers = models.PositiveIntegerField(
+        default=0, verbose_name='подписчики'
+    )
+    comments = models.PositiveIntegerField(
+        default=0, verbose_name='комментарии'
+    )
+
+    class Meta:
+        verbose_name = 'счётчики пользователя'
+        verbose_name_plural = 'счётчики пользователей'
+
+    def __str__(self):
+        return MY_COUNTERS.format(self.user_id)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='подписчик',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='статья',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date',)
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-id'),
+                name='timeline_user_pub_date_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='unique_timeline_post'
+            ),
+        ]
+
+    def __str__(self):
+        return MY_TIMELINE.format(self.user_id, self.post_id)
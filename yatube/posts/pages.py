@@ -0,0 +1,134 @@
+from django.db.models import Max
+
+from core import page_cache
+from posts.models import ArchivedPost, Comment, Group, Post, User
+
+INDEX_PAGES = 'index'
+GROUP_PAGES = 'group:{slug}'
+PROFILE_PAGES = 'profile:{username}'
+POST_PAGES = 'post:{pk}'
+
+
+def feed_validators(queryset):
+    latest = queryset.aggregate(changed=Max('pub_date'), marker=Max('pk'))
+    return latest['changed'], latest['marker']
+
+
+def index_validators(request):
+    return feed_validators(Post.objects.all())
+
+
+def owner_validators(queryset):
+    """Валидаторы ленты группы или автора; None, если их самих нет."""
+    rows = list(
+        queryset.order_by()
+        .values('pk')
+        .annotate(changed=Max('posts__pub_date'), marker=Max('posts__pk'))
+        .values_list('changed', 'marker')[:1]
+    )
+    return rows[0] if rows else None
+
+
+def group_validators(request, slug):
+    return owner_validators(Group.objects.filter(slug=slug))
+
+
+def profile_validators(request, username):
+    return owner_validators(User.objects.filter(username=username))
+
+
+def post_validators(request, pk):
+    """Последний комментарий берётся по индексу (post, -created, -id),
+    а не агрегатом: у поста с тысячами комментариев это та же одна
+    строка, что и у поста без них."""
+    published = (
+        Post.objects.filter(pk=pk).values_list('pub_date', flat=True).first()
+        or ArchivedPost.objects.filter(pk=pk)
+        .values_list('pub_date', flat=True)
+        .first()
+    )
+    if published is None:
+        return None
+    commented, marker = (
+        Comment.objects.filter(post_id=pk)
+        .order_by('-created', '-pk')
+        .values_list('created', 'pk')
+        .first()
+    ) or (None, None)
+    changed = [value for value in (published, commented) if value is not None]
+    return max(changed, default=None), marker
+
+
+def profile_pages(user_ids) -> list:
+    return [
+        PROFILE_PAGES.format(username=username)
+        for username in User.objects.filter(pk__in=user_ids).values_list(
+            'username', flat=True
+        )
+    ]
+
+
+def group_pages(group_ids) -> list:
+    return [
+        GROUP_PAGES.format(slug=slug)
+        for slug in Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True
+        )
+    ]
+
+
+def purge_post(post, old_group_id=None) -> None:
+    """Новый или изменённый пост группы X сбрасывает главную, страницы
+    группы X, профиль автора и сам пост, но не чужие группы и профили."""
+    page_cache.purge(
+        INDEX_PAGES,
+        POST_PAGES.format(pk=post.pk),
+        *group_pages({post.group_id, old_group_id} - {None}),
+        *profile_pages([post.author_id]),
+    )
+
+
+def purge_posts(post_ids) -> None:
+    """purge_post() для многих постов сразу: группы и профили всех
+    постов собираются тремя запросами, а не парой на каждый пост."""
+    posts = list(
+        Post.objects.filter(pk__in=post_ids).values_list(
+            'pk', 'group_id', 'author_id'
+        )
+    )
+    page_cache.purge(
+        INDEX_PAGES,
+        *(POST_PAGES.format(pk=pk) for pk, _, _ in posts),
+        *group_pages({group_id for _, group_id, _ in posts} - {None}),
+        *profile_pages({author_id for _, _, author_id in posts}),
+    )
+
+
+def purge_comment(comment) -> None:
+    page_cache.purge(
+        POST_PAGES.format(pk=comment.post_id),
+        *profile_pages([comment.author_id]),
+    )
+
+
+def purge_follow(follow) -> None:
+    page_cache.purge(*profile_pages([follow.user_id, follow.author_id]))
+
+
+def purge_group(group) -> None:
+    authors = Post.objects.filter(group=group).values('author_id')
+    page_cache.purge(
+        INDEX_PAGES,
+        GROUP_PAGES.format(slug=group.slug),
+        *profile_pages(authors),
+    )
+
+
+def purge_author(user) -> None:
+    posts = Post.objects.filter(author=user).values_list('pk', 'group_id')
+    page_cache.purge(
+        INDEX_PAGES,
+        PROFILE_PAGES.format(username=user.username),
+        *(POST_PAGES.format(pk=pk) for pk, _ in posts),
+        *group_pages({group_id for _, group_id in posts} - {None}),
+    )
@@ -0,0 +1,186 @@
+import hashlib
+import re
+from bisect import bisect_left, bisect_right
+
+from django.core.cache import cache
+from django.db import connections, router
+
+from core.utils import CursorPaginator
+from posts import archive
+from posts.models import Post
+from yatube.settings import (
+    SEARCH_CACHE_MIN_HITS,
+    SEARCH_CACHE_TIMEOUT,
+    SEARCH_COMMENT_WEIGHT,
+    SEARCH_MAX_RESULTS,
+)
+
+RESULTS_KEY = 'posts:search:{}'
+HITS_KEY = 'posts:search:hits:{}'
+WORD = re.compile(r'\w+')
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+# bm25() в FTS5 отрицательна: чем меньше, тем релевантнее. Пост
+# находится и по своим комментариям, но с меньшим весом.
+RANKED_SQL = f'''
+    SELECT post_id, MIN(score) FROM (
+        SELECT rowid AS post_id, bm25({POST_TABLE}) AS score
+        FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s
+        UNION ALL
+        SELECT post_id, bm25({COMMENT_TABLE}) * %s
+        FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s
+    )
+    GROUP BY post_id
+    ORDER BY 2, 1
+    LIMIT %s
+'''
+
+
+def normalize(query: str) -> str:
+    return ' '.join(WORD.findall(query.lower()))
+
+
+def match_expression(query: str) -> str:
+    """Запрос FTS5: все слова обязательны, каждое ищется как префикс,
+    чтобы «пост» находил «посты» без стеммера. Кавычки вокруг слов
+    выключают синтаксис FTS5 в пользовательском вводе."""
+    return ' '.join(f'"{word}"*' for word in query.split())
+
+
+def uses_fts(connection) -> bool:
+    return connection.vendor == 'sqlite'
+
+
+def ranked(query: str) -> list:
+    """До SEARCH_MAX_RESULTS пар (релевантность, pk) по возрастанию.
+
+    Вне SQLite полнотекстового индекса нет: посты ищутся через
+    icontains, а релевантностью служит место в ленте.
+    """
+    connection = connections[router.db_for_read(Post)]
+    if not uses_fts(connection):
+        pks = (
+            Post.objects.filter(text__icontains=query)
+            .order_by('-pub_date', '-pk')
+            .values_list('pk', flat=True)[:SEARCH_MAX_RESULTS]
+        )
+        return [(float(rank), pk) for rank, pk in enumerate(pks)]
+    match = match_expression(query)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            RANKED_SQL,
+            [match, SEARCH_COMMENT_WEIGHT, match, SEARCH_MAX_RESULTS],
+        )
+        return [(score, pk) for pk, score in cursor.fetchall()]
+
+
+def results(query: str) -> list:
+    """Результаты поиска; запрос, повторённый SEARCH_CACHE_MIN_HITS раз
+    за SEARCH_CACHE_TIMEOUT, отдаётся из кэша.
+
+    Кэш не сбрасывается при правках постов: новые и изменённые посты
+    попадают в популярные запросы не позже чем через
+    SEARCH_CACHE_TIMEOUT.
+    """
+    query = normalize(query)
+    if not query:
+        return []
+    digest = hashlib.md5(query.encode()).hexdigest()
+    key = RESULTS_KEY.format(digest)
+    found = cache.get(key)
+    if found is not None:
+        return found
+    found = ranked(query)
+    hits_key = HITS_KEY.format(digest)
+    cache.add(hits_key, 0, SEARCH_CACHE_TIMEOUT)
+    try:
+        hits = cache.incr(hits_key)
+    except ValueError:
+        hits = 1
+    if hits >= SEARCH_CACHE_MIN_HITS:
+        cache.set(key, found, SEARCH_CACHE_TIMEOUT)
+    return found
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорный пагинатор по готовому списку (релевантность, pk).
+
+    Курсор — пара последнего поста страницы, поэтому следующая страница
+    находится бинарным поиском и не зависит от постов, удалённых между
+    запросами. Посты загружаются только для текущей страницы.
+    """
+
+    parse_key = staticmethod(float)
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, key='rank', **kwargs)
+
+    def _fetch(self, after, before):
+        items = self.object_list
+        if before and not after:
+            end = bisect_left(items, before)
+            start = max(end - self.per_page, 0)
+            return self.posts(items[start:end]), True, start > 0
+        start = bisect_right(items, after) if after else 0
+        end = start + self.per_page
+        return self.posts(items[start:end]), end < len(items), bool(after)
+
+    def posts(self, items) -> list:
+        found = archive.in_bulk([pk for _, pk in items], 'author', 'group')
+        posts = []
+        for rank, pk in items:
+            if pk in found:
+                found[pk].rank = rank
+                posts.append(found[pk])
+        return posts
+
+
+def execute(sql: str, params=()) -> None:
+    connection = connections[router.db_for_write(Post)]
+    if uses_fts(connection):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def index_post(post) -> None:
+    execute(
+        f'INSERT OR REPLACE INTO {POST_TABLE}(rowid, text) VALUES (%s, %s)',
+        [post.pk, post.text],
+    )
+
+
+def forget_post(post) -> None:
+    execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s', [post.pk])
+
+
+def index_comment(comment) -> None:
+    execute(
+        f'INSERT OR REPLACE INTO {COMMENT_TABLE}(rowid, text, post_id) '
+        'VALUES (%s, %s, %s)',
+        [comment.pk, comment.text, comment.post_id],
+    )
+
+
+def forget_comment(comment) -> None:
+    execute(f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s', [comment.pk])
+
+
+def rebuild() -> None:
+    """Заново наполняет индекс: нужен после правок в обход сигналов,
+    например QuerySet.update() или загрузки дампа."""
+    for table, columns, source in (
+        (
+            POST_TABLE,
+            'rowid, text',
+            'id, text FROM posts_post '
+            'UNION ALL SELECT id, text FROM posts_archivedpost',
+        ),
+        (
+            COMMENT_TABLE,
+            'rowid, text, post_id',
+            'id, text, post_id FROM posts_comment',
+        ),
+    ):
+        execute(f'DELETE FROM {table}')
+        execute(f'INSERT INTO {table}({columns}) SELECT {source}')
+        execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
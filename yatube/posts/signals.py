@@ -0,0 +1,255 @@
+import logging
+
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.signals import (
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from posts import feeds, pages, search, thumbnails, timeline, uploads
+from posts.counters import bump
+from posts.counts import (
+    FOLLOWER,
+    GROUP,
+    count_key,
+    forget_counts,
+    post_count_keys,
+    shift_counts,
+)
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    User,
+    UserCounters,
+)
+
+LOGIN_FIELDS = frozenset({'last_login'})
+
+logger = logging.getLogger(__name__)
+
+
+def follower_ids(author_id):
+    return Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    keys = post_count_keys(instance, follower_ids(instance.author_id))
+    if created:
+        shift_counts(keys, 1)
+        return
+    old_group_id = getattr(instance, 'old_group_id', None)
+    if old_group_id != instance.group_id:
+        shift_counts([count_key(GROUP, old_group_id)], -1)
+        shift_counts([count_key(GROUP, instance.group_id)], 1)
+    forget_counts(keys)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    shift_counts(
+        post_count_keys(instance, follower_ids(instance.author_id)), -1
+    )
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    cache.delete(count_key(FOLLOWER, instance.user_id))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created and not kwargs.get('raw'):
+        UserCounters.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def authored_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.author_id, 'posts' if sender is Post else 'comments', 1)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+@receiver(post_delete, sender=Comment)
+def authored_deleted(sender, instance, **kwargs):
+    bump(instance.author_id, 'comments' if sender is Comment else 'posts', -1)
+
+
+@receiver(post_delete, sender=ArchivedPost)
+def archived_post_deleted(sender, instance, **kwargs):
+    # Внешнего ключа из Comment в архив нет, каскад делается здесь.
+    Comment.objects.filter(post_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, **kwargs):
+    if created:
+        bump(instance.user_id, 'following', 1)
+        bump(instance.author_id, 'followers', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    bump(instance.user_id, 'following', -1)
+    bump(instance.author_id, 'followers', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    if created:
+        timeline.fan_out(instance)
+        # Список автора сбрасывается, а не дописывается: чтение и запись
+        # в кэш не атомарны, и параллельные посты потерялись бы.
+        feeds.forget_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_forget_recent(sender, instance, **kwargs):
+    feeds.forget_post(instance)
+
+
+def bump_card_versions(**lookup):
+    # Карточки архивных постов показывают те же авторы и группы.
+    for model in (Post, ArchivedPost):
+        model.objects.filter(**lookup).update(
+            card_version=F('card_version') + 1
+        )
+
+
+@receiver(pre_save, sender=Post)
+def post_card_changed(sender, instance, update_fields, **kwargs):
+    # Версия растёт в самом UPDATE: значение из памяти затёрло бы
+    # параллельный рост от комментария, и два состояния карточки
+    # получили бы один номер.
+    if not instance._state.adding and update_fields is None:
+        instance.card_version = F('card_version') + 1
+
+
+@receiver(post_save, sender=Post)
+def post_card_version_loaded(sender, instance, created, **kwargs):
+    if hasattr(instance.card_version, 'resolve_expression'):
+        instance.refresh_from_db(fields=['card_version'])
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_card_changed(sender, instance, **kwargs):
+    bump_card_versions(pk=instance.post_id)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_cards_changed(sender, instance, **kwargs):
+    if not kwargs.get('created'):
+        bump_card_versions(group=instance)
+
+
+@receiver(post_save, sender=User)
+def author_cards_changed(sender, instance, created, update_fields, **kwargs):
+    if not created and not (update_fields and update_fields <= LOGIN_FIELDS):
+        bump_card_versions(author=instance)
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_old(sender, instance, **kwargs):
+    if not instance._state.adding:
+        instance.old_group_id, instance.old_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image')
+            .first()
+        ) or (None, None)
+
+
+@receiver(pre_save, sender=Post)
+def post_image_metadata(sender, instance, **kwargs):
+    if instance.image.name == getattr(instance, 'old_image', None):
+        return
+    metadata = (None, None, '')
+    if instance.image:
+        try:
+            metadata = uploads.image_metadata(instance.image)
+        except Exception:
+            # Нечитаемая картинка не мешает сохранить пост: шаблон
+            # обойдётся без размеров, команда backfill попробует снова.
+            logger.warning(
+                'Не удалось прочитать %s', instance.image, exc_info=True
+            )
+    (
+        instance.image_width,
+        instance.image_height,
+        instance.image_placeholder,
+    ) = metadata
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def post_pages_changed(sender, instance, **kwargs):
+    pages.purge_post(instance, getattr(instance, 'old_group_id', None))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_pages_changed(sender, instance, **kwargs):
+    pages.purge_comment(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_pages_changed(sender, instance, **kwargs):
+    pages.purge_follow(instance)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_pages_changed(sender, instance, **kwargs):
+    pages.purge_group(instance)
+
+
+@receiver(post_save, sender=User)
+def author_pages_changed(sender, instance, created, update_fields, **kwargs):
+    if not created and not (update_fields and update_fields <= LOGIN_FIELDS):
+        pages.purge_author(instance)
+
+
+@receiver(post_save, sender=Post)
+def post_image_uploaded(sender, instance, **kwargs):
+    if instance.image and instance.image.name != getattr(
+        instance, 'old_image', None
+    ):
+        thumbnails.queue_after_commit(instance.image.name)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Comment)
+def search_indexed(sender, instance, update_fields, **kwargs):
+    if update_fields is None or 'text' in update_fields:
+        if sender is Post:
+            search.index_post(instance)
+        else:
+            search.index_comment(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=ArchivedPost)
+def post_search_forgotten(sender, instance, **kwargs):
+    search.forget_post(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_search_forgotten(sender, instance, **kwargs):
+    search.forget_comment(instance)
@@ -0,0 +1,50 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts.thumbnails import ready_variants_many
+from yatube.settings import POST_CARD_TIMEOUT
+
+register = template.Library()
+
+CARD_KEY = 'posts:card:{}:{}:{}'
+CARD_TEMPLATE = 'posts/includes/post.html'
+CARD_PRESET = 'card'
+
+
+def card_key(post, variant: str) -> str:
+    return CARD_KEY.format(post.pk, post.card_version, variant)
+
+
+@register.simple_tag
+def post_cards(posts, hide_profile_link=False, hide_group_link=False):
+    """HTML карточек постов страницы, взятый из кэша одним get_many.
+
+    Ключ включает card_version поста, поэтому правка поста, комментарий,
+    смена группы или автора сразу дают новый ключ, а старый истекает сам.
+    """
+    flags = {
+        'hide_profile_link': hide_profile_link,
+        'hide_group_link': hide_group_link,
+    }
+    variant = f'{int(hide_profile_link)}{int(hide_group_link)}'
+    keys = [card_key(post, variant) for post in posts]
+    cards = cache.get_many(keys)
+    stale = {key: post for post, key in zip(posts, keys) if key not in cards}
+    if stale:
+        # Миниатюры всех перерисовываемых карточек одним запросом,
+        # а не отдельным обращением к kvstore из каждой карточки.
+        flags['thumbnails'] = {
+            CARD_PRESET: ready_variants_many(
+                [post.image for post in stale.values()], CARD_PRESET
+            )
+        }
+    missing = {
+        key: render_to_string(CARD_TEMPLATE, {'post': post, **flags})
+        for key, post in stale.items()
+    }
+    if missing:
+        cache.set_many(missing, POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [mark_safe(cards[key]) for key in keys]
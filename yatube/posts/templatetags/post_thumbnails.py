@@ -0,0 +1,70 @@
+from django import template
+from django.forms.utils import flatatt
+from django.utils.html import format_html, format_html_join
+
+from posts.thumbnails import ready_variants
+from yatube.settings import THUMBNAIL_PRESETS, THUMBNAIL_SIZES
+
+register = template.Library()
+
+MIME_TYPES = {'JPEG': 'image/jpeg', 'WEBP': 'image/webp'}
+PLACEHOLDER_STYLE = "background: url('{}') center / cover no-repeat"
+
+
+def srcset(thumbnails) -> str:
+    return ', '.join(f'{image.url} {width}w' for width, image in thumbnails)
+
+
+@register.simple_tag(takes_context=True)
+def post_picture(
+    context, image, preset_name='card', css_class='card-img my-2'
+):
+    """<picture> с srcset всех готовых размеров пресета.
+
+    WebP отдаётся браузерам, которые его понимают, JPEG остаётся в <img>.
+    Пока миниатюр нет, показывается оригинал. Миниатюры берутся из
+    thumbnails контекста, если страница собрала их заранее.
+    """
+    if not image:
+        return ''
+    prefetched = context.get('thumbnails', {}).get(preset_name, {})
+    if image.name in prefetched:
+        ready = dict(prefetched[image.name])
+    else:
+        ready = ready_variants(image, preset_name)
+    fallback = ready.pop('JPEG', [])
+    sizes = THUMBNAIL_SIZES[preset_name]
+    sources = format_html_join(
+        '',
+        '<source type="{}" srcset="{}" sizes="{}">',
+        (
+            (MIME_TYPES[image_format], srcset(thumbnails), sizes)
+            for image_format, thumbnails in ready.items()
+        ),
+    )
+    # Размеры и заглушка лежат в самом посте: до загрузки картинки
+    # браузер уже знает её пропорции и показывает размытое превью.
+    post = image.instance
+    attrs = {
+        'class': css_class,
+        'src': image.url,
+        'width': post.image_width,
+        'height': post.image_height,
+    }
+    if fallback:
+        base_width = int(THUMBNAIL_PRESETS[preset_name][0].split('x')[0])
+        _, default = min(fallback, key=lambda item: abs(item[0] - base_width))
+        attrs.update(
+            src=default.url,
+            srcset=srcset(fallback),
+            sizes=sizes,
+            width=default.width,
+            height=default.height,
+        )
+    if post.image_placeholder:
+        attrs['style'] = PLACEHOLDER_STYLE.format(post.image_placeholder)
+    return format_html(
+        '<picture>{}<img{} alt=""></picture>',
+        sources,
+        flatatt({name: value for name, value in attrs.items() if value}),
+    )
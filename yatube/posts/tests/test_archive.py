@@ -0,0 +1,186 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.utils import (
+    ARCHIVE_MARK,
+    LOCAL_CACHE_WARNING,
+    TieredCursorPaginator,
+    encode_cursor,
+)
+from posts import search
+from posts.counters import recount
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    User,
+    UserCounters,
+)
+
+INDEX_URL = reverse('posts:index_name')
+OLD = 8
+RECENT = 7
+
+
+def tables(queries) -> str:
+    return ' '.join(query['sql'] for query in queries.captured_queries)
+
+
+class ArchiveTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        now = timezone.now()
+        for number in range(OLD + RECENT):
+            post = Post.objects.create(
+                text=f'пост {number}', author=cls.author, group=cls.group
+            )
+            age = timedelta(days=1000 - number if number < OLD else number)
+            Post.objects.filter(pk=post.pk).update(pub_date=now - age)
+        cls.old = list(Post.objects.order_by('pub_date')[:OLD])
+        cls.comment = Comment.objects.create(
+            post=cls.old[0], author=cls.reader, text='старый комментарий'
+        )
+        cls.feed = list(
+            Post.objects.order_by('-pub_date', '-pk').values_list(
+                'pk', flat=True
+            )
+        )
+        call_command('archive_posts', days=365, stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_old_posts_are_moved(self):
+        self.assertEqual(Post.objects.count(), RECENT)
+        self.assertEqual(
+            list(
+                ArchivedPost.objects.order_by('pub_date').values_list(
+                    'pk', 'pub_date', 'text'
+                )
+            ),
+            [(post.pk, post.pub_date, post.text) for post in self.old],
+        )
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                post_id__in=[post.pk for post in self.old]
+            ).exists()
+        )
+        self.assertTrue(Comment.objects.filter(pk=self.comment.pk).exists())
+
+    def test_author_counters_include_archive(self):
+        recount()
+        self.assertEqual(
+            UserCounters.objects.get(user=self.author).posts, OLD + RECENT
+        )
+
+    def test_cursor_pages_continue_into_archive(self):
+        seen = []
+        url = INDEX_URL
+        while url:
+            page = self.client.get(url).context['page_obj']
+            seen += [post.pk for post in page]
+            cursor = page.paginator.next_cursor
+            url = cursor and f'{INDEX_URL}?after={cursor}'
+        self.assertEqual(seen, self.feed)
+        self.assertTrue(cursor is None)
+
+    def test_pages_touch_only_their_tier(self):
+        def paginator():
+            return TieredCursorPaginator(
+                Post.objects.all(), 5, ArchivedPost.objects.all()
+            )
+
+        with CaptureQueriesContext(connection) as queries:
+            first = paginator().get_cursor_page()
+        self.assertNotIn('posts_archivedpost', tables(queries))
+        border = paginator().get_cursor_page(after=first.paginator.next_cursor)
+        self.assertEqual(len(border), 5)
+        cursor = border.paginator.next_cursor
+        self.assertTrue(cursor.startswith(ARCHIVE_MARK))
+        with CaptureQueriesContext(connection) as queries:
+            deep = paginator().get_cursor_page(after=cursor)
+        self.assertNotIn('"posts_post"', tables(queries))
+        self.assertEqual([post.pk for post in deep], self.feed[10:15])
+        back = paginator().get_cursor_page(
+            before=deep.paginator.previous_cursor
+        )
+        self.assertEqual(list(back), list(border))
+        self.assertTrue(back.has_previous())
+
+    def test_archived_post_is_readable(self):
+        self.client.force_login(self.author)
+        post = self.old[0]
+        response = self.client.get(
+            reverse('posts:post_detail', args=[post.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['post'].archived)
+        self.assertContains(response, 'старый комментарий')
+        self.assertNotContains(
+            response, reverse('posts:update_post', args=[post.pk])
+        )
+        self.assertNotContains(
+            response, reverse('posts:add_comment', args=[post.pk])
+        )
+        profile_url = reverse('posts:profile', args=[self.author.username])
+        profile = self.client.get(
+            profile_url,
+            {'after': ARCHIVE_MARK + encode_cursor(post.pub_date, post.pk)},
+        )
+        self.assertEqual(profile.status_code, 200)
+        broken = self.client.get(profile_url, {'after': ARCHIVE_MARK + 'x'})
+        self.assertEqual(broken.status_code, 404)
+
+    def test_archived_posts_stay_searchable(self):
+        found = search.SearchPaginator(search.results('пост 0'), 20)
+        page = found.get_cursor_page()
+        self.assertIn(self.old[0].pk, [post.pk for post in page])
+
+    def test_deleting_archived_post_removes_comments(self):
+        ArchivedPost.objects.filter(pk=self.old[0].pk).delete()
+        self.assertFalse(Comment.objects.filter(pk=self.comment.pk).exists())
+
+    def test_author_change_bumps_archived_cards(self):
+        archived = ArchivedPost.objects.get(pk=self.old[0].pk)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Новое имя'
+        author.save()
+        self.assertGreater(
+            ArchivedPost.objects.get(pk=archived.pk).card_version,
+            archived.card_version,
+        )
+
+    def test_archive_is_read_only_in_admin(self):
+        request = RequestFactory().get('/')
+        request.user = User.objects.create_superuser('admin', 'a@a.ru', 'x')
+        model_admin = admin.site._registry[ArchivedPost]
+        self.assertTrue(model_admin.has_view_permission(request))
+        self.assertFalse(model_admin.has_add_permission(request))
+        self.assertFalse(model_admin.has_change_permission(request))
+        self.assertFalse(model_admin.has_delete_permission(request))
+
+    def test_command_reports_process_local_cache(self):
+        Post.objects.filter(pk=self.feed[0]).update(
+            pub_date=timezone.now() - timedelta(days=1000)
+        )
+        stdout = StringIO()
+        call_command('archive_posts', days=365, stdout=stdout)
+        self.assertIn(LOCAL_CACHE_WARNING, stdout.getvalue())
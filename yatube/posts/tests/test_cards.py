@@ -0,0 +1,68 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+INDEX_URL = reverse('posts:index_name')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='исходный текст', author=cls.author, group=cls.group
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_card_is_cached(self):
+        """Повторный показ берёт карточку из кэша."""
+        self.client.get(INDEX_URL)
+        Post.objects.filter(pk=self.post.pk).update(text='тайная правка')
+        self.assertContains(self.client.get(INDEX_URL), 'исходный текст')
+
+    def test_changes_bump_card_version(self):
+        """Правка, комментарий, группа и автор сразу меняют карточку."""
+        changes = [
+            lambda: Post.objects.get(pk=self.post.pk).save(),
+            lambda: Comment.objects.create(
+                post=self.post, author=self.author, text='комментарий'
+            ),
+            lambda: Group.objects.get(pk=self.group.pk).save(),
+            lambda: User.objects.get(pk=self.author.pk).save(),
+        ]
+        for change in changes:
+            with self.subTest(change=change):
+                version = Post.objects.get(pk=self.post.pk).card_version
+                change()
+                self.assertEqual(
+                    Post.objects.get(pk=self.post.pk).card_version,
+                    version + 1,
+                )
+
+    def test_edit_and_comment_never_share_version(self):
+        """Правка с устаревшим в памяти номером не затирает рост версии
+        от параллельного комментария."""
+        post = Post.objects.get(pk=self.post.pk)
+        version = post.card_version
+        Comment.objects.create(post=post, author=self.author, text='к')
+        post.text = 'правка'
+        post.save()
+        self.assertEqual(post.card_version, version + 2)
+        self.assertEqual(
+            Post.objects.get(pk=post.pk).card_version, version + 2
+        )
+
+    def test_edit_is_visible_immediately(self):
+        """Отредактированный пост виден без ожидания истечения кэша."""
+        self.client.get(INDEX_URL)
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'новый текст'
+        post.save()
+        self.assertContains(self.client.get(INDEX_URL), 'новый текст')
@@ -0,0 +1,88 @@
+import re
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import views
+from posts.models import Comment, Post, User
+
+PAGE_SIZE = 5
+FRAGMENT = re.compile(r'data-fragment="([^"]+)"')
+
+
+@mock.patch.object(views, 'COMMENT_PAGE_SIZE', PAGE_SIZE)
+class CommentPagesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.busy = Post.objects.create(text='обсуждаемый', author=cls.author)
+        cls.quiet = Post.objects.create(text='тихий', author=cls.author)
+        # bulk_create ставит всем одинаковое created: порядок внутри
+        # страницы и между страницами держится на id.
+        Comment.objects.bulk_create(
+            Comment(post=cls.busy, author=cls.author, text=f'№{number}')
+            for number in range(PAGE_SIZE * 2 + 2)
+        )
+        Comment.objects.create(post=cls.quiet, author=cls.author, text='№0')
+
+    def setUp(self):
+        cache.clear()
+
+    def detail(self, post):
+        return self.client.get(reverse('posts:post_detail', args=[post.pk]))
+
+    def test_first_page_is_rendered_inline(self):
+        response = self.detail(self.busy)
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            list(
+                self.busy.comments.order_by('-created', '-pk').values_list(
+                    'pk', flat=True
+                )[:PAGE_SIZE]
+            ),
+        )
+        self.assertContains(
+            response, f'?after={comments.paginator.next_cursor}#comments'
+        )
+
+    def test_fragments_load_every_comment_once(self):
+        html = self.detail(self.busy).content.decode()
+        loaded = re.findall(r'№\d+', html)
+        while FRAGMENT.search(html):
+            url = FRAGMENT.search(html).group(1).replace('&amp;', '&')
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            html = response.content.decode()
+            self.assertNotIn('<html', html)
+            loaded += re.findall(r'№\d+', html)
+        self.assertEqual(
+            loaded,
+            [f'№{number}' for number in range(PAGE_SIZE * 2 + 1, -1, -1)],
+        )
+
+    def test_busy_post_costs_the_same_as_quiet_one(self):
+        queries = {}
+        for post in (self.busy, self.quiet):
+            with CaptureQueriesContext(connection) as captured:
+                self.detail(post)
+            queries[post] = [query['sql'] for query in captured]
+        self.assertEqual(len(queries[self.busy]), len(queries[self.quiet]))
+        for sql in queries[self.busy]:
+            if 'FROM "posts_comment"' in sql:
+                self.assertIn('LIMIT', sql)
+
+    def test_fragment_of_missing_post_is_not_found(self):
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.quiet.pk + 100])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_script_is_served_as_static_file(self):
+        response = self.detail(self.busy)
+        self.assertContains(response, 'js/comments.js')
+        self.assertNotContains(response, 'addEventListener')
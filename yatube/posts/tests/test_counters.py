@@ -0,0 +1,63 @@
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Post, User, UserCounters
+
+
+class UserCountersTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def counters(self, user):
+        return UserCounters.objects.get(user=user)
+
+    def test_counters_follow_changes(self):
+        """Счётчики растут и убывают вместе с постами, подписками и
+        комментариями."""
+        post = Post.objects.create(text='пост', author=self.author)
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='комментарий'
+        )
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        author, reader = self.counters(self.author), self.counters(self.reader)
+        self.assertEqual((author.posts, author.followers), (1, 1))
+        self.assertEqual((reader.comments, reader.following), (1, 1))
+        comment.delete()
+        follow.delete()
+        post.delete()
+        author, reader = self.counters(self.author), self.counters(self.reader)
+        self.assertEqual((author.posts, author.followers), (0, 0))
+        self.assertEqual((reader.comments, reader.following), (0, 0))
+
+    def test_drifted_counter_does_not_block_deletion(self):
+        """Разошедшийся до нуля счётчик не мешает удалить пост."""
+        post = Post.objects.create(text='пост', author=self.author)
+        UserCounters.objects.filter(user=self.author).update(posts=0)
+        post.delete()
+        self.assertFalse(Post.objects.filter(pk=post.pk).exists())
+        self.assertEqual(self.counters(self.author).posts, 0)
+
+    def test_recount_command_fixes_drift(self):
+        """Команда recount_counters пересчитывает счётчики с нуля."""
+        Post.objects.bulk_create(
+            Post(text=f'пост {i}', author=self.author) for i in range(3)
+        )
+        UserCounters.objects.filter(user=self.reader).delete()
+        call_command('recount_counters', chunk_size=1, stdout=StringIO())
+        self.assertEqual(self.counters(self.author).posts, 3)
+        self.assertEqual(self.counters(self.reader).posts, 0)
+
+    def test_profile_reads_counters_with_author(self):
+        """Профиль не считает счётчики отдельными запросами."""
+        Post.objects.create(text='пост', author=self.author)
+        cache.clear()
+        # Валидаторы, автор со счётчиками, страница постов и архив под
+        # недозаполненной страницей; ни одного COUNT(*).
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/profile/{self.author.username}/')
+        self.assertContains(response, 'Всего статьей: 1')
@@ -0,0 +1,110 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from posts import counts
+from posts.models import Follow, Group, Post, User
+
+
+class CachedCountTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        Follow.objects.create(user=cls.follower, author=cls.author)
+        Post.objects.create(text='пост', author=cls.author, group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def scopes(self):
+        return [
+            (Post.objects.all(), counts.ALL, None),
+            (self.group.posts.all(), counts.GROUP, self.group.pk),
+            (self.author.posts.all(), counts.AUTHOR, self.author.pk),
+            (
+                Post.objects.filter(author__following__user=self.follower),
+                counts.FOLLOWER,
+                self.follower.pk,
+            ),
+        ]
+
+    def test_count_is_cached(self):
+        """Повторный запрос счётчика не ходит в базу."""
+        for queryset, scope, pk in self.scopes():
+            with self.subTest(scope=scope):
+                self.assertEqual(counts.cached_count(queryset, scope, pk), 1)
+                with self.assertNumQueries(0):
+                    counts.cached_count(queryset, scope, pk)
+
+    def test_post_signals_invalidate_counts(self):
+        """Создание и удаление поста обновляет все затронутые ленты."""
+        for queryset, scope, pk in self.scopes():
+            counts.cached_count(queryset, scope, pk)
+        post = Post.objects.create(
+            text='ещё пост', author=self.author, group=self.group
+        )
+        for queryset, scope, pk in self.scopes():
+            with self.subTest(scope=scope):
+                self.assertEqual(counts.cached_count(queryset, scope, pk), 2)
+        post.delete()
+        for queryset, scope, pk in self.scopes():
+            with self.subTest(scope=scope):
+                self.assertEqual(counts.cached_count(queryset, scope, pk), 1)
+
+    def test_large_count_is_shifted(self):
+        """Большой счётчик сдвигается, а не пересчитывается."""
+        key = counts.count_key(counts.ALL)
+        cache.set(key, counts.COUNT_SHIFT_THRESHOLD + 1)
+        Post.objects.create(text='ещё пост', author=self.author)
+        self.assertEqual(cache.get(key), counts.COUNT_SHIFT_THRESHOLD + 2)
+
+    def test_group_change_updates_both_groups(self):
+        other = Group.objects.create(title='Другая', slug='other')
+        old_group = self.group.posts.all()
+        new_group = other.posts.all()
+        counts.cached_count(old_group, counts.GROUP, self.group.pk)
+        counts.cached_count(new_group, counts.GROUP, other.pk)
+        post = Post.objects.get(group=self.group)
+        post.group = other
+        post.save()
+        self.assertEqual(
+            counts.cached_count(old_group, counts.GROUP, self.group.pk), 0
+        )
+        self.assertEqual(
+            counts.cached_count(new_group, counts.GROUP, other.pk), 1
+        )
+
+    def test_expired_key_is_dropped_instead_of_shifted(self):
+        key = counts.count_key(counts.ALL)
+        cache.set(key, counts.COUNT_SHIFT_THRESHOLD + 1)
+        with mock.patch.object(counts.cache, 'incr', side_effect=ValueError):
+            Post.objects.create(text='ещё пост', author=self.author)
+        self.assertIsNone(cache.get(key))
+
+    def test_large_count_is_estimated(self):
+        """Выше порога COUNT(*) ограничен, а число экстраполируется."""
+        Post.objects.all().delete()
+        now = timezone.now()
+        for day in range(8):
+            post = Post.objects.create(text=str(day), author=self.author)
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=day)
+            )
+        cache.clear()
+        with mock.patch.object(counts, 'COUNT_SHIFT_THRESHOLD', 2):
+            with CaptureQueriesContext(connection) as queries:
+                count = counts.cached_count(
+                    Post.objects.all(), counts.ALL, None
+                )
+        self.assertEqual(count, 7)
+        self.assertIn('LIMIT 3', queries[0]['sql'])
+        self.assertFalse(any('COUNT' in query['sql'] for query in queries[1:]))
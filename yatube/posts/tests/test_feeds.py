@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase
+
+from posts import feeds
+from posts.models import Follow, Post, User
+from yatube.settings import PAGE_SIZE
+
+POSTS_PER_AUTHOR = PAGE_SIZE + 3
+
+
+class FollowFeedEnginesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        for name in ('first', 'second'):
+            author = User.objects.create_user(username=name)
+            Follow.objects.create(user=cls.reader, author=author)
+            for i in range(POSTS_PER_AUTHOR):
+                Post.objects.create(text=f'{name} {i}', author=author)
+        Post.objects.create(text='чужой пост', author=cls.stranger)
+        cls.expected = list(
+            Post.objects.filter(author__following__user=cls.reader).order_by(
+                '-pub_date', '-pk'
+            )
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def walk(self, engine):
+        """Проходит ленту курсором вперёд и обратно."""
+        pages = []
+        params = {}
+        while True:
+            request = RequestFactory().get('/follow/', params)
+            request.user = self.reader
+            page = feeds.follow_feed(request, engine)
+            pages.append(list(page))
+            if not page.has_next():
+                break
+            params = {'after': page.paginator.next_cursor}
+        request = RequestFactory().get(
+            '/follow/', {'before': page.paginator.previous_cursor}
+        )
+        request.user = self.reader
+        back = list(feeds.follow_feed(request, engine))
+        return pages, back
+
+    def test_engines_return_same_feed(self):
+        for limit in (feeds.FOLLOW_FEED_RECENT_LIMIT, PAGE_SIZE // 2):
+            for engine in feeds.FOLLOW_FEEDS:
+                with self.subTest(engine=engine, limit=limit), mock.patch(
+                    'posts.feeds.FOLLOW_FEED_RECENT_LIMIT', limit
+                ):
+                    cache.clear()
+                    pages, back = self.walk(engine)
+                    self.assertEqual(sum(pages, []), self.expected)
+                    self.assertEqual(back, pages[-2])
+
+    def test_new_post_reaches_cached_merge_feed(self):
+        """Новый пост сбрасывает закэшированный список автора."""
+        request = RequestFactory().get('/follow/')
+        request.user = self.reader
+        feeds.follow_feed(request, 'merge')
+        post = Post.objects.create(
+            text='свежий', author=self.expected[0].author
+        )
+        with self.assertNumQueries(3):
+            page = feeds.follow_feed(request, 'merge')
+        self.assertEqual(page[0], post)
+
+    def test_cold_cache_loads_all_authors_at_once(self):
+        """Промахи кэша по любому числу авторов — один запрос."""
+        for i in range(5):
+            author = User.objects.create_user(username=f'author{i}')
+            Follow.objects.create(user=self.reader, author=author)
+            Post.objects.create(text='пост', author=author)
+        author_ids = list(
+            Follow.objects.filter(user=self.reader).values_list(
+                'author_id', flat=True
+            )
+        )
+        with self.assertNumQueries(1):
+            recent = feeds.recent_posts(author_ids)
+        self.assertEqual(
+            recent[self.expected[0].author_id][0],
+            (self.expected[0].pub_date, self.expected[0].pk),
+        )
+        self.assertEqual(len(recent), len(author_ids))
@@ -1,3 +1,4 @@
+import hashlib
 import shutil
 import tempfile
 from http import HTTPStatus
@@ -27,6 +28,11 @@ small_gif = (
     b'\x02\x00\x01\x00\x00\x02\x02\x0C'
     b'\x0A\x00\x3B'
 )
+SMALL_GIF_HASH = hashlib.sha256(small_gif).hexdigest()
+SMALL_GIF_NAME = (
+    f'{UPLOAD_TO}{SMALL_GIF_HASH[:2]}/{SMALL_GIF_HASH[2:4]}/'
+    f'{SMALL_GIF_HASH}.gif'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -99,7 +105,7 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, self.post_author)
         self.assertEqual(self.post.group.pk, form_data['group'])
-        self.assertEqual(post.image, f"{UPLOAD_TO}{form_data['image']}")
+        self.assertEqual(post.image, SMALL_GIF_NAME)
 
     def test_nonauthorized_user_create_post(self):
         """Проверка создания записи не авторизированным пользователем."""
@@ -141,7 +147,7 @@ class PostFormTests(TestCase):
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, old_author)
         self.assertEqual(post.group.pk, form_data['group'])
-        self.assertEqual(post.image, f"{UPLOAD_TO}{form_data['image']}")
+        self.assertEqual(post.image, SMALL_GIF_NAME)
         self.assertEqual(
             self.authorized_user.get(self.POST_DETAIL_URL).status_code,
             HTTPStatus.OK,
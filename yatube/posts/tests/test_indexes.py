@@ -0,0 +1,97 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.utils import encode_cursor
+from posts.models import Comment, Follow, Group, Post, User
+
+# Полный проход по таблице или сортировка во временном B-дереве:
+# на больших таблицах такой запрос растёт вместе с данными. Проход по
+# subquery допустим: это результат ограниченного LIMIT подзапроса.
+BAD_PLAN = re.compile(r'^SCAN (TABLE )?(?!subquery$)\w+$|USE TEMP B-TREE')
+
+
+def query_plan(sql: str) -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class FeedQueryPlanTest(TestCase):
+    """Каждый запрос лент идёт по индексу: EXPLAIN QUERY PLAN не должен
+    содержать ни полного сканирования таблицы, ни временной сортировки."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='группа', slug='group', description='описание'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.posts = [
+            Post.objects.create(
+                text=f'пост {number}', author=cls.author, group=cls.group
+            )
+            for number in range(12)
+        ]
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='комментарий'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            if not query['sql'].startswith('SELECT'):
+                continue
+            for step in query_plan(query['sql']):
+                with self.subTest(url=url, sql=query['sql'], step=step):
+                    self.assertIsNone(BAD_PLAN.search(step))
+        return response
+
+    def assert_feed_indexed(self, url):
+        first = self.assert_indexed(url)
+        paginator = first.context['page_obj'].paginator
+        self.assertIsNotNone(paginator.next_cursor)
+        second = self.assert_indexed(f'{url}?after={paginator.next_cursor}')
+        previous = second.context['page_obj'].paginator.previous_cursor
+        self.assert_indexed(f'{url}?before={previous}')
+        self.assert_indexed(f'{url}?page=2')
+
+    def test_index(self):
+        self.assert_feed_indexed(reverse('posts:index_name'))
+
+    def test_group_posts(self):
+        self.assert_feed_indexed(
+            reverse('posts:group_posts', args=[self.group.slug])
+        )
+
+    def test_profile(self):
+        self.assert_feed_indexed(
+            reverse('posts:profile', args=[self.author.username])
+        )
+
+    def test_follow_index(self):
+        self.assert_feed_indexed(reverse('posts:follow_index'))
+
+    def test_post_detail(self):
+        self.assert_indexed(
+            reverse('posts:post_detail', args=[self.posts[0].pk])
+        )
+
+    def test_post_comments(self):
+        comment = Comment.objects.get()
+        self.assert_indexed(
+            reverse('posts:post_comments', args=[self.posts[0].pk])
+            + f'?after={encode_cursor(comment.created, comment.pk)}'
+        )
@@ -0,0 +1,126 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores import cached_db_kvstore
+
+from posts import thumbnails
+from posts.models import Post, User
+from posts.tests.test_uploads import make_image
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+class OtherKVStore(cached_db_kvstore.KVStore):
+    """Наследник cached_db: его записи команде читать напрямую нельзя."""
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class CollectMediaCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        author = User.objects.create_user(username='author')
+        self.kept = Post.objects.create(
+            text='пост', author=author, image=make_image((1200, 800))
+        )
+        orphan = Post.objects.create(
+            text='пост', author=author, image=make_image((900, 600))
+        )
+        for post in (self.kept, orphan):
+            thumbnails.generate_variants(post.image.name)
+        self.kept_thumbnails = self.thumbnail_paths(self.kept)
+        # Миниатюра размера, которого нет в пресетах: её знает только
+        # список миниатюр источника в kvstore.
+        extra = thumbnails.backend.get_thumbnail(
+            ImageFile(orphan.image.name, orphan.image.storage), '50x50'
+        )
+        self.orphan_thumbnails = [
+            *self.thumbnail_paths(orphan),
+            Path(extra.storage.path(extra.name)),
+        ]
+        self.orphan = Path(orphan.image.path)
+        self.orphan_source = ImageFile(orphan.image.name, orphan.image.storage)
+        orphan.delete()
+        self.stray = Path(TEMP_MEDIA_ROOT, 'cache', 'ab', 'cd', 'stray.jpg')
+        self.stray.parent.mkdir(parents=True)
+        self.stray.write_bytes(b'x' * 10)
+
+    def thumbnail_paths(self, post):
+        ready = thumbnails.ready_variants(post.image, 'card')
+        return [
+            Path(thumbnail.storage.path(thumbnail.name))
+            for variants in ready.values()
+            for _, thumbnail in variants
+        ]
+
+    def collect(self, *args):
+        stdout = StringIO()
+        call_command('collect_media', '--min-age=-1', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def garbage(self):
+        return [self.orphan, self.stray, *self.orphan_thumbnails]
+
+    def test_dry_run_only_reports(self):
+        self.assertEqual(len(self.orphan_thumbnails), 4)
+        output = self.collect()
+        self.assertIn(
+            f'Оригиналов: 1, миниатюр: {len(self.orphan_thumbnails) + 1}',
+            output,
+        )
+        self.assertIn('Можно освободить', output)
+        for path in self.garbage():
+            self.assertTrue(path.exists())
+
+    def test_delete_removes_only_unreferenced_files(self):
+        self.assertIn('Освобождено', self.collect('--delete'))
+        for path in self.garbage():
+            self.assertFalse(path.exists())
+        self.assertTrue(Path(self.kept.image.path).exists())
+        for path in self.kept_thumbnails:
+            self.assertTrue(path.exists())
+        self.assertEqual(len(self.thumbnail_paths(self.kept)), 3)
+        self.assertIsNone(default.kvstore.get(self.orphan_source))
+
+    def test_quarantine_moves_files(self):
+        quarantine = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, quarantine)
+        output = self.collect(f'--quarantine={quarantine}')
+        self.assertIn(
+            f'Оригиналов: 1, миниатюр: {len(self.orphan_thumbnails) + 1}',
+            output,
+        )
+        for path in self.garbage():
+            with self.subTest(path=path):
+                self.assertFalse(path.exists())
+                self.assertTrue(
+                    (quarantine / path.relative_to(TEMP_MEDIA_ROOT)).exists()
+                )
+
+    def test_young_files_are_kept(self):
+        stdout = StringIO()
+        call_command('collect_media', '--delete', stdout=stdout)
+        self.assertIn('Оригиналов: 0, миниатюр: 0', stdout.getvalue())
+        self.assertTrue(self.orphan.exists())
+
+    def test_other_kvstore_skips_unregistered_thumbnails(self):
+        """Без cached_db kvstore файлы без записей не трогаются."""
+        with mock.patch.object(default, 'kvstore', OtherKVStore()):
+            output = self.collect('--delete')
+        self.assertIn('не cached_db', output)
+        self.assertTrue(self.stray.exists())
+        for path in self.kept_thumbnails:
+            self.assertTrue(path.exists())
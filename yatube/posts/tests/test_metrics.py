@@ -0,0 +1,92 @@
+from io import StringIO
+from time import monotonic
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.template import engines
+from django.test import TestCase
+from django.urls import reverse
+
+from core import metrics, middleware
+from posts.models import Group, Post, User
+
+INDEX_URL = reverse('posts:index_name')
+
+
+@mock.patch.object(middleware, 'REQUEST_METRICS_SAMPLE_RATE', 1)
+@mock.patch.object(metrics, 'REQUEST_METRICS_FLUSH_SAMPLES', 1)
+class RequestMetricsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        metrics.pending.clear()
+
+    def test_view_metrics_are_recorded(self):
+        self.client.get(INDEX_URL)
+        self.client.get(INDEX_URL)
+        stats = metrics.stats()['posts:index_name']
+        self.assertEqual(stats['requests'], 2)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['wall_ms'], 0)
+
+    def test_samples_are_sent_to_cache_in_batches(self):
+        """Замеры копятся в процессе: кэш трогает только каждый третий."""
+        with mock.patch.object(
+            metrics, 'REQUEST_METRICS_FLUSH_SAMPLES', 3
+        ), mock.patch.object(metrics, 'flushed_at', monotonic()):
+            self.client.get(INDEX_URL)
+            self.client.get(INDEX_URL)
+            self.assertEqual(metrics.stats(), {})
+            self.client.get(INDEX_URL)
+        self.assertEqual(metrics.stats()['posts:index_name']['requests'], 3)
+
+    def test_templates_are_timed(self):
+        sample = metrics.Sample()
+        token = metrics.current.set(sample)
+        try:
+            engines['django'].from_string('{{ text }}').render({'text': 1})
+        finally:
+            metrics.current.reset(token)
+        self.assertGreater(sample.template, 0)
+        self.assertFalse(sample.rendering)
+
+    def test_repeated_queries_are_counted_as_duplicates(self):
+        groups = [
+            Group.objects.create(slug=f'g{number}', title='группа')
+            for number in range(3)
+        ]
+        sample = metrics.Sample()
+        with connection.execute_wrapper(sample):
+            for group in groups:
+                Group.objects.get(pk=group.pk)
+        self.assertEqual(sample.queries, 3)
+        self.assertEqual(sample.duplicates, 2)
+
+    def test_budget_overrun_is_logged(self):
+        with mock.patch.object(
+            metrics,
+            'REQUEST_BUDGET_OVERRIDES',
+            {'posts:index_name': {'queries': 0}},
+        ), self.assertLogs('core.metrics', 'WARNING') as logs:
+            self.client.get(INDEX_URL)
+        self.assertIn('posts:index_name', logs.output[0])
+        self.assertIn('queries', logs.output[0])
+
+    def test_unsampled_requests_are_not_recorded(self):
+        with mock.patch.object(middleware, 'REQUEST_METRICS_SAMPLE_RATE', 0):
+            self.client.get(INDEX_URL)
+        self.assertEqual(metrics.stats(), {})
+
+    def test_command_shows_and_resets_metrics(self):
+        self.client.get(INDEX_URL)
+        stdout = StringIO()
+        call_command('request_metrics', stdout=stdout)
+        self.assertIn('posts:index_name: запросов 1', stdout.getvalue())
+        call_command('request_metrics', '--reset', stdout=StringIO())
+        self.assertEqual(metrics.stats(), {})
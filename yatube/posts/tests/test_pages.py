@@ -0,0 +1,163 @@
+import warnings
+
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from core import page_cache
+from posts.models import Comment, Group, Post, User
+
+INDEX_URL = reverse('posts:index_name')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='описание'
+        )
+        cls.post = Post.objects.create(
+            text='пост', author=cls.author, group=cls.group
+        )
+        cls.urls = {
+            'index': INDEX_URL,
+            'group': reverse('posts:group_posts', args=[cls.group.slug]),
+            'other': reverse('posts:group_posts', args=[cls.other_group.slug]),
+            'profile': reverse('posts:profile', args=[cls.author.username]),
+            'detail': reverse('posts:post_detail', args=[cls.post.pk]),
+        }
+
+    def setUp(self):
+        cache.clear()
+        for url in self.urls.values():
+            self.client.get(url)
+
+    def cache_status(self):
+        return {
+            name: self.client.get(url)['X-Page-Cache']
+            for name, url in self.urls.items()
+        }
+
+    def test_anonymous_pages_are_cached(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов к БД."""
+        with self.assertNumQueries(0):
+            response = self.client.get(INDEX_URL)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertGreater(page_cache.stats()['hits'], 0)
+
+    def test_authorized_pages_are_not_cached(self):
+        client = Client()
+        client.force_login(self.author)
+        self.assertNotIn('X-Page-Cache', client.get(INDEX_URL))
+
+    def test_new_post_purges_only_its_pages(self):
+        """Новый пост группы сбрасывает главную и свою группу, но не
+        чужую."""
+        Post.objects.create(text='новый', author=self.author, group=self.group)
+        self.assertEqual(
+            self.cache_status(),
+            {
+                'index': 'miss',
+                'group': 'miss',
+                'other': 'hit',
+                'profile': 'miss',
+                'detail': 'hit',
+            },
+        )
+
+    def test_page_params_are_normalized(self):
+        """Равные номера страниц делят ключ, битые не кэшируются."""
+        self.assertEqual(
+            self.client.get(INDEX_URL, {'page': '01'})['X-Page-Cache'], 'miss'
+        )
+        self.assertEqual(
+            self.client.get(INDEX_URL, {'page': '1'})['X-Page-Cache'], 'hit'
+        )
+        for params in ({'page': 'x' * 500}, {'after': 'случайный'}):
+            with self.subTest(params=params):
+                self.assertNotIn(
+                    'X-Page-Cache', self.client.get(INDEX_URL, params)
+                )
+
+    def test_cache_keys_are_safe_for_memcached(self):
+        group = Group.objects.create(title='Группа', slug='номер группы')
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            Post.objects.create(text='пост', author=self.author, group=group)
+            page_cache.generation('group:номер группы')
+
+    def test_comment_purges_post_detail(self):
+        Comment.objects.create(post=self.post, author=self.author, text='к')
+        status = self.cache_status()
+        self.assertEqual(status['detail'], 'miss')
+        self.assertEqual(status['index'], 'hit')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(text='пост', author=cls.author)
+        cls.detail_url = reverse('posts:post_detail', args=[cls.post.pk])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_unchanged_pages_answer_304(self):
+        """Повторный запрос с валидаторами получает 304 без запросов к БД."""
+        for url in (INDEX_URL, self.detail_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                with self.assertNumQueries(0):
+                    self.assertEqual(
+                        self.client.get(
+                            url, HTTP_IF_NONE_MATCH=response['ETag']
+                        ).status_code,
+                        304,
+                    )
+                self.assertEqual(
+                    self.client.get(
+                        url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+                    ).status_code,
+                    304,
+                )
+
+    def test_not_modified_repeats_validators(self):
+        """304 несёт те же ETag и Last-Modified, что и 200."""
+        for url in (INDEX_URL, self.detail_url):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                not_modified = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=response['ETag']
+                )
+                self.assertEqual(not_modified.status_code, 304)
+                for header in ('ETag', 'Last-Modified'):
+                    self.assertEqual(not_modified[header], response[header])
+
+    def test_missing_pages_get_no_validators(self):
+        """Несуществующая страница — 404 без ETag даже на If-None-Match."""
+        for url in (
+            reverse('posts:group_posts', args=['missing']),
+            reverse('posts:profile', args=['missing']),
+            reverse('posts:post_detail', args=[self.post.pk + 100]),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+                self.assertEqual(response.status_code, 404)
+                self.assertFalse(response.has_header('ETag'))
+                self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_new_comment_changes_etag(self):
+        response = self.client.get(self.detail_url)
+        Comment.objects.create(post=self.post, author=self.author, text='к')
+        self.assertEqual(
+            self.client.get(
+                self.detail_url, HTTP_IF_NONE_MATCH=response['ETag']
+            ).status_code,
+            200,
+        )
@@ -0,0 +1,163 @@
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from faker import Faker
+from mixer.backend.django import mixer
+
+from about.urls import urlpatterns as about_urls
+from posts.models import Comment, Follow, Group, Post, User
+from posts.urls import urlpatterns as posts_urls
+from users.urls import urlpatterns as users_urls
+from yatube.settings import PAGE_SIZE
+
+fake = Faker('ru_RU')
+TOPIC = 'путешествие'
+ROUTES = [
+    (namespace, pattern)
+    for namespace, patterns in (
+        ('posts', posts_urls),
+        ('users', users_urls),
+        ('about', about_urls),
+    )
+    for pattern in patterns
+]
+QUERY_STRINGS = {'posts:search': f'?q={TOPIC}'}
+# Потолок SQL-запросов маршрута с холодным кэшем: (аноним, автор).
+# Анонима login_required-маршруты сразу отправляют на вход.
+BUDGETS = {
+    'posts:create_post': (0, 3),
+    'posts:group_posts': (5, 7),
+    'posts:index_name': (4, 6),
+    'posts:post_detail': (5, 7),
+    'posts:profile': (5, 8),
+    'posts:update_post': (0, 5),
+    'posts:add_comment': (0, 2),
+    'posts:post_comments': (3, 5),
+    'posts:follow_index': (0, 4),
+    'posts:search': (3, 5),
+    'posts:profile_follow': (0, 14),
+    'posts:profile_unfollow': (0, 8),
+    'users:signup': (0, 2),
+    'users:logout': (0, 4),
+    'users:login': (0, 2),
+    'users:password_change': (0, 2),
+    'users:password_change_done': (0, 2),
+    'users:password_reset': (0, 2),
+    'users:password_reset_done': (0, 2),
+    'users:password_reset_confirm': (1, 3),
+    'users:password_reset_complete': (0, 2),
+    'about:author': (0, 2),
+    'about:tech': (0, 2),
+}
+# Ответы, отличные от 200: (аноним, автор). login_required-маршруты
+# отправляют анонима на вход, подписка и комментарий — на страницу.
+STATUSES = {
+    'posts:create_post': (302, 200),
+    'posts:update_post': (302, 200),
+    'posts:add_comment': (302, 302),
+    'posts:follow_index': (302, 200),
+    'posts:profile_follow': (302, 302),
+    'posts:profile_unfollow': (302, 302),
+    'users:password_change': (302, 200),
+    'users:password_change_done': (302, 200),
+}
+
+
+def text():
+    return f'{TOPIC} {fake.paragraph(nb_sentences=5)}'
+
+
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = mixer.blend(User, username='author')
+        cls.other = mixer.blend(User, username='other')
+        cls.group = mixer.blend(Group, slug='travel', title=fake.word())
+        cls.post = mixer.blend(
+            Post, author=cls.author, group=cls.group, text=text()
+        )
+        mixer.blend(Comment, post=cls.post, author=cls.other, text=text())
+        cls.followed = mixer.blend(User, username='followed')
+        Follow.objects.create(user=cls.author, author=cls.followed)
+        # Отписке нужна настоящая подписка, иначе замерялся бы 404.
+        Follow.objects.create(user=cls.author, author=cls.other)
+        mixer.blend(Post, author=cls.followed, text=text())
+        mixer.blend(Post, author=cls.other, group=cls.group, text=text())
+        cls.kwargs = {
+            'slug': cls.group.slug,
+            'pk': cls.post.pk,
+            'username': cls.other.username,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+
+    def grow(self):
+        """Добавляет по странице постов в каждую ленту и комментариев
+        к посту, все от разных авторов."""
+        authors = mixer.cycle(PAGE_SIZE).blend(User)
+        Follow.objects.bulk_create(
+            Follow(user=self.author, author=author) for author in authors
+        )
+        for author in authors:
+            mixer.blend(Post, author=author, group=self.group, text=text())
+            mixer.blend(Comment, post=self.post, author=author, text=text())
+            mixer.blend(Post, author=self.other, text=text())
+
+    def url(self, namespace, pattern):
+        kwargs = {key: self.kwargs[key] for key in pattern.pattern.converters}
+        name = f'{namespace}:{pattern.name}'
+        return reverse(name, kwargs=kwargs) + QUERY_STRINGS.get(name, '')
+
+    def count_queries(self, name, url, user) -> int:
+        cache.clear()
+        if user:
+            self.client.force_login(user)
+        else:
+            self.client.logout()
+        # Записи вроде подписки откатываются, чтобы замеры не зависели
+        # от порядка маршрутов.
+        with transaction.atomic(), CaptureQueriesContext(
+            connection
+        ) as queries:
+            response = self.client.get(url)
+            transaction.set_rollback(True)
+        # Бюджет ошибочного ответа ничего не говорит о маршруте.
+        self.assertEqual(
+            response.status_code,
+            STATUSES.get(name, (200, 200))[user is not None],
+            f'{name}, {user}',
+        )
+        return len(queries)
+
+    def test_every_route_has_budget(self):
+        self.assertEqual(
+            sorted(
+                f'{namespace}:{pattern.name}' for namespace, pattern in ROUTES
+            ),
+            sorted(BUDGETS),
+        )
+
+    def test_routes_fit_query_budget(self):
+        """Бюджет не зависит от числа постов и комментариев на странице:
+        после grow() запросов не больше, чем на почти пустых лентах.
+        Недозаполненная страница дочитывает архив, поэтому там запросов
+        бывает на один больше."""
+        users = (None, self.author)
+        urls = [
+            (f'{namespace}:{pattern.name}', self.url(namespace, pattern))
+            for namespace, pattern in ROUTES
+        ]
+        sparse = {
+            (name, user): self.count_queries(name, url, user)
+            for name, url in urls
+            for user in users
+        }
+        self.grow()
+        for name, url in urls:
+            for user, budget in zip(users, BUDGETS[name]):
+                with self.subTest(route=name, user=user):
+                    queries = self.count_queries(name, url, user)
+                    self.assertLessEqual(queries, sparse[name, user])
+                    self.assertLessEqual(queries, budget)
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connections, router
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core import page_cache, routers
+from posts import pages
+from posts.models import Post, User
+from yatube.settings import REPLICA_PIN_COOKIE
+
+INDEX_URL = reverse('posts:index_name')
+
+
+def post_queries(queries):
+    return [
+        query['sql']
+        for query in queries.captured_queries
+        if '"posts_post"' in query['sql']
+    ]
+
+
+@mock.patch.object(routers, 'DATABASE_REPLICAS', ['replica'])
+class ReplicaRouterTest(TestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # В тестах реплика — второе подключение к той же базе в памяти.
+        # Django держит на нём свою транзакцию, и без read_uncommitted
+        # блокировки таблиц общего кэша SQLite мешают основной базе.
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('PRAGMA read_uncommitted = 1')
+
+    def setUp(self):
+        cache.clear()
+        # Главную сбросили давно: реплика успела догнать запись.
+        cache.set(
+            page_cache.GENERATION_KEY.format(
+                page_cache.digest(pages.INDEX_PAGES)
+            ),
+            timezone.now() - timedelta(minutes=5),
+            None,
+        )
+
+    def get(self, url):
+        with CaptureQueriesContext(
+            connections['default']
+        ) as primary, CaptureQueriesContext(connections['replica']) as replica:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, post_queries(primary), post_queries(replica)
+
+    def test_feed_reads_go_to_replica(self):
+        _, primary, replica = self.get(INDEX_URL)
+        self.assertTrue(replica)
+        self.assertEqual(primary, [])
+
+    def test_fill_right_after_purge_reads_primary(self):
+        """Страница, собранная сразу после сброса, ляжет в кэш на весь
+        TTL, поэтому отставшую реплику она не читает."""
+        page_cache.purge(pages.INDEX_PAGES)
+        _, primary, replica = self.get(INDEX_URL)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_login_reads_session_from_primary(self):
+        """Вход не закрепляет за основной базой, но сессия и пользователь
+        читаются из неё, так что вошедший не получит анонимную главную."""
+        User.objects.create_user(username='reader', password='secret')
+        self.client.get(INDEX_URL)
+        response = self.client.post(
+            reverse('users:login'),
+            {'username': 'reader', 'password': 'secret', 'next': '/'},
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+        with CaptureQueriesContext(connections['replica']) as replica:
+            response, _, _ = self.get(INDEX_URL)
+        self.assertTrue(response.context['user'].is_authenticated)
+        self.assertFalse(
+            [
+                query['sql']
+                for query in replica.captured_queries
+                if 'FROM "django_session"' in query['sql']
+                or 'FROM "auth_user"' in query['sql']
+            ]
+        )
+
+    def test_writer_reads_from_primary(self):
+        """После записи, даже сделанной GET-запросом, пользователь на
+        время закреплён за основной базой."""
+        reader = User.objects.create_user(username='reader')
+        author = User.objects.create_user(username='author')
+        self.client.force_login(reader)
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertIn(REPLICA_PIN_COOKIE, response.cookies)
+        _, primary, replica = self.get(INDEX_URL)
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_reads_without_writes_are_not_pinned(self):
+        response, _, _ = self.get(INDEX_URL)
+        self.assertNotIn(REPLICA_PIN_COOKIE, response.cookies)
+
+    def test_writes_go_to_primary_inside_replica_view(self):
+        token = routers.replica.set('replica')
+        try:
+            self.assertEqual(router.db_for_read(Post), 'replica')
+            self.assertEqual(router.db_for_read(User), 'default')
+            self.assertEqual(router.db_for_write(Post), 'default')
+        finally:
+            routers.replica.reset(token)
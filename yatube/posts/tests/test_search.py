@@ -0,0 +1,121 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post, User
+from yatube.settings import PAGE_SIZE
+
+SEARCH_URL = reverse('posts:search')
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.focused = Post.objects.create(
+            author=cls.author, text='Рецепт борща: свёкла, борщ и сметана.'
+        )
+        cls.mentioned = Post.objects.create(
+            author=cls.author,
+            text='Длинный пост о поездке на дачу, где кто-то сварил '
+            'борщ, а потом все долго гуляли по лесу и собирали грибы.',
+        )
+        cls.commented = Post.objects.create(
+            author=cls.author, text='Фотография с обеда.'
+        )
+        Comment.objects.create(
+            author=cls.author, post=cls.commented, text='Это борщ?'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def found(self, query):
+        return [pk for _, pk in search.ranked(search.normalize(query))]
+
+    def test_results_ranked_by_relevance(self):
+        self.assertEqual(
+            self.found('борщ'),
+            [self.focused.pk, self.mentioned.pk, self.commented.pk],
+        )
+
+    def test_all_words_required_and_prefixes_match(self):
+        self.assertEqual(self.found('гриб дач'), [self.mentioned.pk])
+        self.assertEqual(self.found('БОРЩА'), [self.focused.pk])
+        self.assertEqual(self.found('фото'), [self.commented.pk])
+
+    def test_fts_syntax_in_query_is_ignored(self):
+        self.assertEqual(self.found('"обеда" OR NEAR(*'), [])
+        self.assertEqual(search.results('*** "'), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        post = Post.objects.get(pk=self.focused.pk)
+        post.text = 'Рецепт щей'
+        post.save()
+        self.assertNotIn(self.focused.pk, self.found('борщ'))
+        self.assertEqual(self.found('щей'), [self.focused.pk])
+        Comment.objects.filter(post=self.commented).delete()
+        self.assertEqual(self.found('борщ'), [self.mentioned.pk])
+        Post.objects.filter(pk=self.mentioned.pk).delete()
+        self.assertEqual(self.found('борщ'), [])
+
+    def test_rebuild_restores_index_after_bulk_update(self):
+        Post.objects.filter(pk=self.commented.pk).update(text='Окрошка')
+        self.assertEqual(self.found('окрошка'), [])
+        call_command('rebuild_search_index', stdout=mock.Mock())
+        self.assertEqual(self.found('окрошка'), [self.commented.pk])
+
+    def test_popular_queries_are_cached(self):
+        with mock.patch.object(
+            search, 'ranked', wraps=search.ranked
+        ) as ranked:
+            for _ in range(4):
+                search.results('Борщ!')
+                search.results('борщ')
+        self.assertEqual(ranked.call_count, search.SEARCH_CACHE_MIN_HITS)
+
+
+class SearchViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        Post.objects.bulk_create(
+            Post(author=author, text=f'Заметка номер {number}')
+            for number in range(PAGE_SIZE + 3)
+        )
+        call_command('rebuild_search_index', stdout=mock.Mock())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages_cover_all_results(self):
+        response = self.client.get(SEARCH_URL, {'q': 'заметка'})
+        first = response.context['page_obj']
+        self.assertEqual(len(first), PAGE_SIZE)
+        cursor = first.paginator.next_cursor
+        self.assertContains(response, '?q=%D0%B7%D0%B0%D0%BC%D0%B5%D1%82')
+        self.assertContains(response, f'after={cursor}')
+        second = self.client.get(
+            SEARCH_URL, {'q': 'заметка', 'after': cursor}
+        ).context['page_obj']
+        self.assertEqual(len(second), 3)
+        self.assertFalse(second.has_next())
+        self.assertEqual(
+            {post.pk for post in [*first, *second]},
+            set(Post.objects.values_list('pk', flat=True)),
+        )
+        back = self.client.get(
+            SEARCH_URL,
+            {'q': 'заметка', 'before': second.paginator.previous_cursor},
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+
+    def test_empty_query_renders_form(self):
+        response = self.client.get(SEARCH_URL)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page_obj']), 0)
+        self.assertNotContains(response, 'Ничего не нашлось')
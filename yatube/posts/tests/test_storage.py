@@ -0,0 +1,67 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core.storage import is_content_addressed
+from core.views import media
+from posts.models import Post, User
+from posts.tests.test_uploads import make_image
+from yatube.settings import IMMUTABLE_CACHE_CONTROL
+
+CREATE_URL = reverse('posts:create_post')
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        self.client.post(CREATE_URL, {'text': 'пост', 'image': image})
+        return Post.objects.latest('pk').image
+
+    def test_image_is_named_by_sharded_content_hash(self):
+        image = self.upload(make_image())
+        digest = hashlib.sha256(Path(image.path).read_bytes()).hexdigest()
+        self.assertEqual(
+            image.name, f'posts/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
+        self.assertTrue(is_content_addressed(image.name))
+
+    def test_identical_uploads_share_one_file(self):
+        first = self.upload(make_image())
+        second = self.upload(make_image())
+        self.assertEqual(first.name, second.name)
+        files = [
+            path
+            for path in Path(first.path).parent.iterdir()
+            if path.is_file()
+        ]
+        self.assertEqual(files, [Path(first.path)])
+
+    def test_duplicate_upload_refreshes_mtime(self):
+        image = self.upload(make_image())
+        os.utime(image.path, (0, 0))
+        self.upload(make_image())
+        self.assertGreater(os.path.getmtime(image.path), 0)
+
+    def test_hashed_media_is_served_as_immutable(self):
+        image = self.upload(make_image())
+        request = RequestFactory().get(image.url)
+        response = media(request, image.name, document_root=TEMP_MEDIA_ROOT)
+        self.assertEqual(response['Cache-Control'], IMMUTABLE_CACHE_CONTROL)
@@ -0,0 +1,224 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+def make_image(name='photo.jpg', size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPregenerationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(
+            text='пост', author=self.author, image=make_image()
+        )
+
+    def test_render_serves_original_until_ready(self):
+        """Пока миниатюры нет, карточка показывает оригинал и ставит
+        генерацию в очередь, а не создаёт её в запросе."""
+        with mock.patch.object(thumbnails, 'queue_after_commit') as queue:
+            response = self.client.get(f'/posts/{self.post.pk}/')
+        self.assertContains(response, self.post.image.url)
+        queue.assert_called_with(self.post.image.name)
+
+    def test_generated_thumbnails_are_served_in_srcset(self):
+        version = self.post.card_version
+        thumbnails.generate_thumbnails(self.post.image.name)
+        ready = thumbnails.ready_variants(self.post.image, 'card')
+        sizes = [
+            (width, thumbnail.width, thumbnail.height)
+            for width, thumbnail in ready['JPEG']
+        ]
+        self.assertEqual(
+            sizes, [(480, 480, 170), (960, 960, 339), (1920, 1920, 678)]
+        )
+        self.assertGreater(
+            Post.objects.get(pk=self.post.pk).card_version, version
+        )
+        response = self.client.get(f'/posts/{self.post.pk}/')
+        for _, thumbnail in ready['JPEG']:
+            self.assertContains(
+                response, f'{thumbnail.url} {thumbnail.width}w'
+            )
+        self.assertContains(response, f'src="{ready["JPEG"][1][1].url}"')
+
+    def test_queue_skips_duplicates(self):
+        with mock.patch.object(thumbnails, 'ThreadPoolExecutor') as pool:
+            thumbnails.executor = None
+            thumbnails.queue_thumbnails(self.post.image.name)
+            thumbnails.queue_thumbnails(self.post.image.name)
+        self.assertEqual(pool.return_value.submit.call_count, 1)
+        thumbnails.executor = None
+
+    def test_queued_job_generates_thumbnails(self):
+        with mock.patch.object(thumbnails, 'executor', InlineExecutor()):
+            thumbnails.queue_thumbnails(self.post.image.name)
+        ready = thumbnails.ready_variants(self.post.image, 'card')
+        self.assertEqual(len(ready['JPEG']), 3)
+
+    def test_queue_is_skipped_without_pregeneration(self):
+        pending = len(connection.run_on_commit)
+        with mock.patch.object(thumbnails, 'THUMBNAIL_PREGENERATE', False):
+            thumbnails.queue_after_commit(self.post.image.name)
+        self.assertEqual(len(connection.run_on_commit), pending)
+
+    def test_variants_include_webp_when_supported(self):
+        with mock.patch.object(
+            thumbnails.features, 'check', return_value=True
+        ):
+            formats = {variant[0] for variant in thumbnails.variants('card')}
+        self.assertEqual(formats, {'WEBP', 'JPEG'})
+
+
+class InlineExecutor:
+    def __init__(self, **kwargs):
+        pass
+
+    def submit(self, func, *args):
+        return func(*args)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def map(self, func, items):
+        return map(func, items)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class WarmThumbnailsCommandTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(
+                text='пост', author=author, image=make_image(size=size)
+            )
+            for size in ((1200, 800), (1500, 1000), (1800, 1200))
+        ]
+
+    def setUp(self):
+        self.checkpoint = Path(tempfile.mkdtemp()) / 'checkpoint'
+        self.addCleanup(shutil.rmtree, self.checkpoint.parent)
+
+    def warm(self, *args):
+        stdout = StringIO()
+        with mock.patch(
+            'posts.management.commands.warm_thumbnails.ProcessPoolExecutor',
+            InlineExecutor,
+        ):
+            call_command(
+                'warm_thumbnails',
+                '--chunk-size=2',
+                f'--checkpoint={self.checkpoint}',
+                *args,
+                stdout=stdout,
+            )
+        return stdout.getvalue()
+
+    def test_warm_up_generates_every_image(self):
+        self.assertIn('Готово: 3 картинок', self.warm())
+        for post in self.posts:
+            ready = thumbnails.ready_variants(post.image, 'card')
+            self.assertEqual(len(ready['JPEG']), 3)
+        self.assertFalse(self.checkpoint.exists())
+
+    def test_warm_up_resumes_from_checkpoint(self):
+        """Прерванный прогон продолжается после сохранённого поста."""
+        self.checkpoint.write_text(str(self.posts[1].pk))
+        output = self.warm()
+        self.assertIn(f'Продолжаем после поста {self.posts[1].pk}', output)
+        self.assertIn('Готово: 1 картинок', output)
+
+    def test_warm_up_purges_cached_pages(self):
+        """Закэшированная главная со старыми карточками сбрасывается."""
+        cache.clear()
+        self.client.get('/')
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'hit')
+        self.warm()
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'miss')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailPrefetchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='author')
+        cls.posts = [
+            Post.objects.create(
+                text='пост', author=author, image=make_image(size=size)
+            )
+            for size in ((1200, 800), (1500, 1000), (1800, 1200))
+        ]
+        # Записи kvstore, оставшиеся в кэше от других тестов, ссылаются
+        # на уже удалённые строки и сбивают генерацию вариантов.
+        cache.clear()
+        for post in cls.posts:
+            thumbnails.generate_variants(post.image.name)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_page_reads_thumbnails_with_one_query(self):
+        """Миниатюры всех карточек страницы — один запрос к kvstore."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/')
+        kvstore_queries = [
+            query['sql']
+            for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        for post in self.posts:
+            ready = thumbnails.ready_variants(post.image, 'card')
+            self.assertContains(response, ready['JPEG'][1][1].url)
+
+    def test_cached_lookup_skips_database(self):
+        images = [post.image for post in self.posts]
+        thumbnails.ready_variants_many(images, 'card')
+        with self.assertNumQueries(0):
+            ready = thumbnails.ready_variants_many(images, 'card')
+        self.assertEqual(set(ready), {image.name for image in images})
+
+    def test_other_kvstore_is_read_through_public_api(self):
+        """Внутренности cached_db трогаются только у самого cached_db."""
+        kvstore = mock.Mock(spec=['get'])
+        kvstore.get.side_effect = lambda thumbnail: thumbnail
+        thumbnail = thumbnails.backend.thumbnail_file(
+            self.posts[0].image, '480x170', {}
+        )
+        with mock.patch.object(thumbnails.default, 'kvstore', kvstore):
+            loaded = thumbnails.load_thumbnails([thumbnail])
+        self.assertEqual(loaded, {thumbnail.key: thumbnail})
+        kvstore.get.assert_called_once_with(thumbnail)
@@ -0,0 +1,67 @@
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import timeline
+from posts.models import Follow, Post, TimelineEntry, User
+
+FOLLOW_INDEX_URL = reverse('posts:follow_index')
+
+
+class TimelineTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{i}') for i in range(3)
+        ]
+        cls.old_post = Post.objects.create(text='старый', author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.readers[0])
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет старые посты автора, отписка их убирает."""
+        follow = Follow.objects.create(
+            user=self.readers[0], author=self.author
+        )
+        self.assertEqual(
+            list(self.client.get(FOLLOW_INDEX_URL).context['page_obj']),
+            [self.old_post],
+        )
+        follow.delete()
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_large_fan_out_finishes_after_commit(self):
+        """Сверх inline подписчиков пост раскладывается после коммита."""
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(text='новый', author=self.author)
+        TimelineEntry.objects.filter(post=post).delete()
+        callbacks = len(connection.run_on_commit)
+        timeline.fan_out(post, chunk_size=1, inline=1)
+        self.assertEqual(TimelineEntry.objects.filter(post=post).count(), 1)
+        # TestCase не коммитит транзакцию: колбэк запускается вручную.
+        _, callback = connection.run_on_commit.pop(callbacks)
+        callback()
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(),
+            len(self.readers),
+        )
+
+    def test_new_post_fans_out_in_chunks(self):
+        """Новый пост попадает в ленты всех подписчиков пачками."""
+        for reader in self.readers:
+            Follow.objects.create(user=reader, author=self.author)
+        post = Post.objects.create(text='новый', author=self.author)
+        TimelineEntry.objects.filter(post=post).delete()
+        with self.assertNumQueries(3):
+            timeline.fan_out(post, chunk_size=2)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(),
+            len(self.readers),
+        )
+        self.assertEqual(
+            self.client.get(FOLLOW_INDEX_URL).context['page_obj'][0], post
+        )
@@ -0,0 +1,168 @@
+import shutil
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core.utils import LOCAL_CACHE_WARNING
+from posts import archive, search, transfer
+from posts.models import (
+    ArchivedPost,
+    Comment,
+    Follow,
+    Group,
+    Post,
+    TimelineEntry,
+    User,
+    UserCounters,
+)
+
+IMAGE = 'posts/ab/cd/abcd.jpg'
+
+
+class ContentTransferTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                text=f'Пост\nномер "{number}", с запятой',
+                author=cls.author,
+                group=cls.group if number % 2 else None,
+            )
+            for number in range(5)
+        ]
+        Post.objects.filter(pk=cls.posts[0].pk).update(
+            image=IMAGE,
+            image_width=640,
+            image_height=480,
+            image_placeholder='data:image/jpeg;base64,AAAA',
+            image_bytes_saved=1234,
+        )
+        Comment.objects.create(
+            post=cls.posts[0], author=cls.reader, text='комментарий'
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def snapshot(self):
+        return {
+            'groups': list(Group.objects.values_list('slug', 'title')),
+            'posts': list(
+                Post.objects.order_by('pk').values_list(
+                    'pk',
+                    'text',
+                    'pub_date',
+                    'author__username',
+                    'group__slug',
+                    'image',
+                    'image_width',
+                    'image_height',
+                    'image_placeholder',
+                    'image_bytes_saved',
+                )
+            ),
+            'comments': list(
+                Comment.objects.values_list(
+                    'pk', 'post_id', 'author__username', 'text', 'created'
+                )
+            ),
+            'follows': list(
+                Follow.objects.values_list(
+                    'user__username', 'author__username'
+                )
+            ),
+        }
+
+    def round_trip(self, fmt):
+        before = self.snapshot()
+        call_command(
+            'export_content', self.directory, format=fmt, stdout=StringIO()
+        )
+        Group.objects.all().delete()
+        Post.objects.all().delete()
+        User.objects.filter(username='author').delete()
+        stdout = StringIO()
+        call_command(
+            'import_content', self.directory, batch_size=2, stdout=stdout
+        )
+        self.assertEqual(self.snapshot(), before)
+        return stdout.getvalue()
+
+    def test_jsonl_round_trip(self):
+        output = self.round_trip('jsonl')
+        self.assertIn('posts: 5 строк', output)
+        self.assertIn('строк/с', output)
+        self.assertIn('Заведено пользователей без пароля: 1', output)
+        author = User.objects.get(username='author')
+        self.assertFalse(author.has_usable_password())
+
+    def test_csv_round_trip(self):
+        self.round_trip('csv')
+
+    def test_derived_data_is_rebuilt(self):
+        self.round_trip('jsonl')
+        author = User.objects.get(username='author')
+        self.assertEqual(
+            UserCounters.objects.values_list('posts', 'followers').get(
+                user=author
+            ),
+            (5, 1),
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 5
+        )
+        self.assertEqual(len(search.ranked('комментарий')), 1)
+        post = Post.objects.create(text='после загрузки', author=author)
+        self.assertGreater(post.pk, self.posts[-1].pk)
+
+    def test_repeated_import_skips_existing_rows(self):
+        call_command('export_content', self.directory, stdout=StringIO())
+        before = self.snapshot()
+        call_command('import_content', self.directory, stdout=StringIO())
+        self.assertEqual(self.snapshot(), before)
+
+    def test_import_rejects_other_post_with_same_pk(self):
+        call_command('export_content', self.directory, stdout=StringIO())
+        post = self.posts[2]
+        Post.objects.filter(pk=post.pk).update(text='другой пост')
+        with self.assertRaisesMessage(CommandError, f'posts: pk {post.pk}'):
+            call_command('import_content', self.directory, stdout=StringIO())
+
+    def test_post_moved_to_other_tier_is_not_duplicated(self):
+        call_command('export_content', self.directory, stdout=StringIO())
+        archive.move([self.posts[0].pk])
+        call_command('import_content', self.directory, stdout=StringIO())
+        self.assertFalse(Post.objects.filter(pk=self.posts[0].pk).exists())
+        self.assertTrue(
+            ArchivedPost.objects.filter(pk=self.posts[0].pk).exists()
+        )
+
+    def test_local_cache_is_reported(self):
+        call_command('export_content', self.directory, stdout=StringIO())
+        stdout = StringIO()
+        call_command('import_content', self.directory, stdout=stdout)
+        self.assertIn(LOCAL_CACHE_WARNING, stdout.getvalue())
+
+
+class KeyMapTest(TestCase):
+    def test_size_is_bounded_but_batch_keys_are_kept(self):
+        for name in 'abcd':
+            User.objects.create_user(username=name)
+        users = transfer.KeyMap(User.objects.all(), 'username', max_size=2)
+        users.resolve(['a', 'b'])
+        users.resolve(['b', 'c'])
+        self.assertEqual(set(users.pks), {'b', 'c'})
+        with self.assertNumQueries(0):
+            users.resolve(['b', 'c', None, ''])
+        self.assertEqual(users['c'], User.objects.get(username='c').pk)
+        self.assertIsNone(users[None])
@@ -0,0 +1,220 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import uploads
+from posts.models import Post, User
+
+CREATE_URL = reverse('posts:create_post')
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def tearDownModule():
+    shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+
+def make_image(size=(1200, 800)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'teal').save(buffer, 'JPEG')
+    return SimpleUploadedFile('photo.jpg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class UploadLimitsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        return self.client.post(
+            CREATE_URL, {'text': 'пост', 'image': image}, follow=True
+        )
+
+    def test_oversized_file_is_rejected_while_streaming(self):
+        with mock.patch.object(uploads, 'IMAGE_UPLOAD_MAX_SIZE', 1000):
+            response = self.upload(make_image())
+        self.assertFormError(
+            response,
+            'form',
+            'image',
+            uploads.TOO_LARGE.format('1000\xa0байт'),
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_too_many_pixels_rejected_before_decoding(self):
+        image = make_image((2000, 1500))
+        with mock.patch.object(
+            uploads, 'IMAGE_UPLOAD_MAX_PIXELS', 2_000_000
+        ), mock.patch.object(uploads.Image.Image, 'load') as load:
+            response = self.upload(image)
+        load.assert_not_called()
+        self.assertFormError(
+            response, 'form', 'image', uploads.TOO_MANY_PIXELS.format(2)
+        )
+        self.assertFalse(Post.objects.exists())
+
+    def test_large_original_is_downscaled_once(self):
+        with mock.patch.object(uploads, 'IMAGE_MAX_EDGE', 600):
+            self.upload(make_image())
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (600, 400))
+
+    def test_small_original_is_kept(self):
+        self.upload(make_image())
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (1200, 800))
+
+    def test_admin_upload_is_downscaled_too(self):
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        self.client.force_login(admin)
+        with mock.patch.object(uploads, 'IMAGE_MAX_EDGE', 600):
+            self.client.post(
+                reverse('admin:posts_post_add'),
+                {
+                    'text': 'пост',
+                    'author': self.author.pk,
+                    'image': make_image(),
+                },
+            )
+        post = Post.objects.get()
+        self.assertEqual((post.image.width, post.image.height), (600, 400))
+
+
+class UploadSizeLimitHandlerTest(TestCase):
+    def test_handler_swallows_tail_and_reports_size(self):
+        handler = uploads.UploadSizeLimitHandler()
+        handler.new_file('image', 'photo.jpg', 'image/jpeg', None)
+        with mock.patch.object(uploads, 'IMAGE_UPLOAD_MAX_SIZE', 10):
+            self.assertEqual(handler.receive_data_chunk(b'x' * 8, 0), b'x' * 8)
+            self.assertIsNone(handler.receive_data_chunk(b'x' * 8, 8))
+            upload = handler.file_complete(16)
+        self.assertIsInstance(upload, uploads.OversizedUpload)
+        self.assertEqual(upload.size, 16)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageMetadataTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(
+            text='пост', author=cls.author, image=make_image()
+        )
+
+    def setUp(self):
+        # Та же картинка из других тестов даёт то же имя файла: готовые
+        # миниатюры из их kvstore не должны попасть в карточку.
+        cache.clear()
+
+    def test_dimensions_and_placeholder_saved_on_upload(self):
+        self.assertEqual(
+            (self.post.image_width, self.post.image_height), (1200, 800)
+        )
+        self.assertTrue(
+            self.post.image_placeholder.startswith('data:image/jpeg;base64,')
+        )
+
+    def test_card_renders_dimensions_without_thumbnails(self):
+        response = self.client.get(f'/posts/{self.post.pk}/')
+        self.assertContains(response, 'width="1200"')
+        self.assertContains(response, 'height="800"')
+        self.assertContains(response, self.post.image_placeholder)
+
+    def test_backfill_fills_missing_metadata(self):
+        Post.objects.update(
+            image_width=None, image_height=None, image_placeholder=''
+        )
+        stdout = StringIO()
+        call_command('backfill_image_metadata', stdout=stdout)
+        self.assertIn('Заполнено постов: 1, ошибок: 0', stdout.getvalue())
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.image_width, post.image_height), (1200, 800))
+        self.assertEqual(post.image_placeholder, self.post.image_placeholder)
+        self.assertGreater(post.card_version, self.post.card_version)
+
+
+def make_photo(size=(1200, 800), orientation=6):
+    """JPEG «с телефона»: EXIF с ориентацией и высокое качество."""
+    buffer = BytesIO()
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = 'Phone'
+    Image.effect_noise(size, 64).convert('RGB').save(
+        buffer, 'JPEG', quality=98, exif=exif.tobytes()
+    )
+    return SimpleUploadedFile('photo.jpeg', buffer.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReencodeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def upload(self, image):
+        self.client.post(CREATE_URL, {'text': 'пост', 'image': image})
+        return Post.objects.latest('pk')
+
+    def test_photo_is_rotated_stripped_and_progressive(self):
+        photo = make_photo()
+        post = self.upload(photo)
+        self.assertTrue(post.image.name.endswith('.jpg'))
+        with Image.open(post.image.path) as image:
+            self.assertEqual(image.size, (800, 1200))
+            self.assertEqual(len(image.getexif()), 0)
+            self.assertTrue(image.info.get('progressive'))
+        self.assertEqual(post.image_bytes_saved, photo.size - post.image.size)
+        self.assertGreater(post.image_bytes_saved, 0)
+
+    def test_compact_photo_without_metadata_is_kept(self):
+        """Пересохранение, которое не меньше оригинала, не нужно."""
+        buffer = BytesIO()
+        Image.effect_noise((600, 400), 64).convert('RGB').save(
+            buffer, 'JPEG', quality=30
+        )
+        photo = SimpleUploadedFile('photo.jpg', buffer.getvalue())
+        post = self.upload(photo)
+        self.assertEqual(post.image.read(), buffer.getvalue())
+        self.assertEqual(post.image_bytes_saved, 0)
+
+    def test_edit_without_upload_keeps_bytes_saved(self):
+        post = self.upload(make_photo())
+        self.client.post(
+            reverse('posts:update_post', args=[post.pk]),
+            {'text': 'правка'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'правка')
+        self.assertGreater(post.image_bytes_saved, 0)
+
+    def test_graphics_are_kept_as_is(self):
+        buffer = BytesIO()
+        Image.new('RGBA', (50, 50), (255, 0, 0, 128)).save(buffer, 'PNG')
+        post = self.upload(
+            SimpleUploadedFile('logo.png', buffer.getvalue(), 'image/png')
+        )
+        self.assertTrue(post.image.name.endswith('.png'))
+        self.assertEqual(post.image.read(), buffer.getvalue())
+        self.assertEqual(post.image_bytes_saved, 0)
+
+    def test_reencoding_can_be_disabled(self):
+        photo = make_photo()
+        with mock.patch.object(uploads, 'IMAGE_REENCODE', False):
+            post = self.upload(photo)
+        photo.seek(0)
+        self.assertEqual(post.image.read(), photo.read())
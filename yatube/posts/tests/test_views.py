@@ -197,6 +197,11 @@ class PaginatorViewsTest(TestCase):
         cls.another_client = Client()
         cls.another_client.force_login(cls.another_user)
 
+    def setUp(self):
+        # bulk_create не шлёт сигналы, счётчики лент из других тестов
+        # могут остаться в кэше.
+        cache.clear()
+
     def test_paginator_on_pages(self):
         url_pages = [
             (INDEX_URL, PAGE_SIZE),
@@ -214,3 +219,34 @@ class PaginatorViewsTest(TestCase):
                     len(self.another_client.get(url).context.get('page_obj')),
                     expected_count,
                 )
+
+    def test_cursor_paginator_on_pages(self):
+        """Курсоры ?after= и ?before= листают ленты без номеров страниц."""
+        for url in (
+            INDEX_URL,
+            PROFILE_URL,
+            GROUP_POSTS_URL,
+            FOLLOW_INDEX_URL,
+        ):
+            with self.subTest(url=url):
+                first_page = self.another_client.get(url).context['page_obj']
+                self.assertEqual(len(first_page), PAGE_SIZE)
+                self.assertFalse(first_page.has_previous())
+                second_page = self.another_client.get(
+                    url, {'after': first_page.paginator.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(len(second_page), POSTS_ON_SECOND_PAGE)
+                self.assertFalse(second_page.has_next())
+                self.assertFalse(set(first_page) & set(second_page))
+                back_page = self.another_client.get(
+                    url, {'before': second_page.paginator.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back_page), list(first_page))
+
+    def test_malformed_cursor_is_not_found(self):
+        for url in (INDEX_URL, PROFILE_URL, GROUP_POSTS_URL):
+            for params in ({'after': 'битый'}, {'before': 'Zm9vfGJhcg'}):
+                with self.subTest(url=url, params=params):
+                    self.assertEqual(
+                        self.another_client.get(url, params).status_code, 404
+                    )
@@ -0,0 +1,224 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from PIL import features
+from sorl.thumbnail import base, default
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores import cached_db_kvstore
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts import pages
+from posts.models import Post
+from yatube.settings import (
+    THUMBNAIL_FORMATS,
+    THUMBNAIL_PREGENERATE,
+    THUMBNAIL_PRESETS,
+    THUMBNAIL_QUEUE_TIMEOUT,
+    THUMBNAIL_WIDTHS,
+    THUMBNAIL_WORKERS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED_KEY = 'thumbnail:queued:{}'
+executor = None
+
+
+class ThumbnailBackend(base.ThumbnailBackend):
+    """Бэкенд sorl, который умеет назвать файл миниатюры, не создавая
+    её в текущем запросе."""
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        # Те же умолчания, что и в get_thumbnail(): имя файла миниатюры
+        # должно совпасть с тем, что создаст фоновая генерация.
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+backend = ThumbnailBackend()
+
+
+def supported_formats() -> tuple:
+    # WebP есть не в каждой сборке Pillow: без libwebp остаётся JPEG.
+    return tuple(
+        image_format
+        for image_format in THUMBNAIL_FORMATS
+        if image_format != 'WEBP' or features.check('webp')
+    )
+
+
+def variants(preset_name: str):
+    """Все размеры и форматы пресета: (формат, ширина, геометрия, опции).
+
+    Высота каждого размера сохраняет пропорции базовой геометрии.
+    """
+    geometry, options = THUMBNAIL_PRESETS[preset_name]
+    width, height = (int(side) for side in geometry.split('x'))
+    for image_format in supported_formats():
+        for variant_width in THUMBNAIL_WIDTHS:
+            yield (
+                image_format,
+                variant_width,
+                f'{variant_width}x{round(height * variant_width / width)}',
+                {**options, 'format': image_format},
+            )
+
+
+def kvstore_is_cached_db() -> bool:
+    """Стоит ли cached_db kvstore sorl, чьё устройство можно читать
+    напрямую. Наследники не в счёт: они могут хранить записи иначе."""
+    # default.kvstore — LazyObject: класс хранилища виден только так.
+    return default.kvstore.__class__ is cached_db_kvstore.KVStore
+
+
+def load_thumbnails(thumbnail_files) -> dict:
+    """Записи kvstore sorl для многих миниатюр сразу: {ключ: ImageFile}.
+
+    То же, что kvstore.get() по одной, но одним get_many к кэшу и одним
+    запросом к базе за промахами. Отсутствие записи кэшируется так же,
+    как это делает сам sorl, чтобы не ходить за ней в базу снова.
+
+    Пакетное чтение повторяет устройство cached_db kvstore sorl, поэтому
+    любой другой kvstore (в том числе наследник) читается по одной
+    записи через публичный kvstore.get().
+    """
+    kvstore = default.kvstore
+    if not kvstore_is_cached_db():
+        loaded = {}
+        for thumbnail in thumbnail_files:
+            found = kvstore.get(thumbnail)
+            if found is not None:
+                loaded[thumbnail.key] = found
+        return loaded
+    raw_keys = {
+        add_prefix(thumbnail.key): thumbnail.key
+        for thumbnail in thumbnail_files
+    }
+    values = kvstore.cache.get_many(raw_keys)
+    missing = [key for key in raw_keys if key not in values]
+    if missing:
+        stored = dict(
+            KVStoreModel.objects.filter(key__in=missing).values_list(
+                'key', 'value'
+            )
+        )
+        found = {
+            key: stored.get(key, cached_db_kvstore.EMPTY_VALUE)
+            for key in missing
+        }
+        kvstore.cache.set_many(
+            found, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+        )
+        values.update(found)
+    return {
+        raw_keys[key]: deserialize_image_file(value)
+        for key, value in values.items()
+        if value and value != cached_db_kvstore.EMPTY_VALUE
+    }
+
+
+def ready_variants_many(images, preset_name: str) -> dict:
+    """Готовые миниатюры пресета для всех картинок страницы:
+    {имя картинки: {формат: [(ширина, файл)]}}.
+
+    Недостающие размеры ставятся в фоновую очередь, шаблон пока
+    обходится готовыми или оригиналом.
+    """
+    wanted = [
+        (
+            image.name,
+            image_format,
+            width,
+            backend.thumbnail_file(image, geometry, options),
+        )
+        for image in images
+        if image
+        for image_format, width, geometry, options in variants(preset_name)
+    ]
+    loaded = load_thumbnails(thumbnail for *_, thumbnail in wanted)
+    ready = {}
+    missing = set()
+    for name, image_format, width, thumbnail in wanted:
+        formats = ready.setdefault(name, {})
+        if thumbnail.key in loaded:
+            formats.setdefault(image_format, []).append(
+                (width, loaded[thumbnail.key])
+            )
+        else:
+            missing.add(name)
+    for name in missing:
+        queue_after_commit(name)
+    return ready
+
+
+def ready_variants(image, preset_name: str) -> dict:
+    """Готовые миниатюры пресета одной картинки: {формат: [(ширина, файл)]}."""
+    if not image:
+        return {}
+    return ready_variants_many([image], preset_name)[image.name]
+
+
+def generate_variants(image_name: str) -> str:
+    # Хранилище входит в ключ kvstore sorl: источник должен быть тем же,
+    # что и у поля Post.image в шаблонах.
+    source = ImageFile(image_name, Post._meta.get_field('image').storage)
+    for preset_name in THUMBNAIL_PRESETS:
+        for _, _, geometry, options in variants(preset_name):
+            backend.get_thumbnail(source, geometry, **options)
+    return image_name
+
+
+def generate_thumbnails(image_name: str) -> None:
+    """Создаёт миниатюры всех пресетов и обновляет карточки постов."""
+    try:
+        generate_variants(image_name)
+        posts = Post.objects.filter(image=image_name)
+        posts.update(card_version=F('card_version') + 1)
+        for post in posts:
+            pages.purge_post(post)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры %s', image_name)
+    finally:
+        cache.delete(QUEUED_KEY.format(image_name))
+        close_old_connections()
+
+
+def queue_thumbnails(image_name: str) -> None:
+    """Ставит генерацию в пул потоков, не дублируя уже поставленную.
+
+    Пул живёт в процессе веб-воркера: задания, не успевшие выполниться
+    до перезапуска или перезагрузки воркера, теряются. Картинка просто
+    ждёт следующего показа, а всё пропущенное разом досоздаёт команда
+    warm_thumbnails.
+    """
+    global executor
+    if not cache.add(
+        QUEUED_KEY.format(image_name), True, THUMBNAIL_QUEUE_TIMEOUT
+    ):
+        return
+    if executor is None:
+        executor = ThreadPoolExecutor(
+            max_workers=THUMBNAIL_WORKERS, thread_name_prefix='thumbnails'
+        )
+    executor.submit(generate_thumbnails, image_name)
+
+
+def queue_after_commit(image_name: str) -> None:
+    if THUMBNAIL_PREGENERATE:
+        transaction.on_commit(partial(queue_thumbnails, image_name))
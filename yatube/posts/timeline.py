@@ -0,0 +1,125 @@
+from functools import partial
+from itertools import islice
+
+from django.db import transaction
+
+from posts.models import Follow, Post, TimelineEntry
+from yatube.settings import TIMELINE_CHUNK_SIZE, TIMELINE_FAN_OUT_INLINE
+
+
+def chunked(iterable, size: int = TIMELINE_CHUNK_SIZE):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def insert_entries(entries, chunk_size: int = TIMELINE_CHUNK_SIZE) -> None:
+    for chunk in chunked(entries, chunk_size):
+        TimelineEntry.objects.bulk_create(chunk, ignore_conflicts=True)
+
+
+def entries(post_id, pub_date, user_ids):
+    return (
+        TimelineEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+        for user_id in user_ids
+    )
+
+
+def fan_out(
+    post,
+    chunk_size: int = TIMELINE_CHUNK_SIZE,
+    inline: int = TIMELINE_FAN_OUT_INLINE,
+) -> None:
+    """Раскладывает новый пост по лентам всех подписчиков автора.
+
+    В транзакции сохранения поста его получают только первые inline
+    подписчиков, поэтому блокировка записи не держится всю раскладку.
+    Остальные получают пост после коммита, в том же запросе, пачками
+    по chunk_size, каждая в своей короткой транзакции. Если процесс
+    упадёт между коммитом и раскладкой, недостающие записи восстановит
+    timeline.fill().
+    """
+    if post.author_id is None:
+        return
+    follows = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .order_by('pk')
+        .values_list('pk', 'user_id')[: inline + 1]
+    )
+    insert_entries(
+        entries(
+            post.pk, post.pub_date, (user for _, user in follows[:inline])
+        ),
+        chunk_size,
+    )
+    if len(follows) > inline:
+        transaction.on_commit(
+            partial(
+                fan_out_rest,
+                post.author_id,
+                post.pk,
+                post.pub_date,
+                follows[inline - 1][0] if inline else 0,
+                chunk_size,
+            )
+        )
+
+
+def fan_out_rest(author_id, post_id, pub_date, after, chunk_size) -> None:
+    """Раскладывает пост подписчикам с pk подписки больше after."""
+    follower_ids = (
+        Follow.objects.filter(author_id=author_id, pk__gt=after)
+        .order_by('pk')
+        .values_list('user_id', flat=True)
+        .iterator(chunk_size=chunk_size)
+    )
+    for chunk in chunked(follower_ids, chunk_size):
+        with transaction.atomic():
+            # Пост могли удалить или перенести в архив после коммита.
+            if not Post.objects.filter(pk=post_id).exists():
+                return
+            TimelineEntry.objects.bulk_create(
+                entries(post_id, pub_date, chunk), ignore_conflicts=True
+            )
+
+
+def backfill(user_id, author_id, chunk_size=TIMELINE_CHUNK_SIZE) -> None:
+    """Добавляет в ленту подписчика все посты нового автора."""
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .values_list('pk', 'pub_date')
+        .iterator(chunk_size=chunk_size)
+    )
+    insert_entries(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ),
+        chunk_size,
+    )
+
+
+def prune(user_id, author_id) -> None:
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+def fill(chunk_size: int = TIMELINE_CHUNK_SIZE) -> None:
+    """Заводит записи лент для всех подписок разом, например после
+    загрузки данных в обход сигналов. Уже существующие пропускаются."""
+    rows = (
+        Post.objects.filter(author__following__isnull=False)
+        .values_list('author__following__user_id', 'pk', 'pub_date')
+        .iterator(chunk_size=chunk_size)
+    )
+    insert_entries(
+        (
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for user_id, pk, pub_date in rows
+        ),
+        chunk_size,
+    )
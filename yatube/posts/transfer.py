@@ -0,0 +1,354 @@
+import csv
+import json
+import time
+from contextlib import contextmanager
+from functools import partial
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils.dateparse import parse_datetime
+
+from posts import search, timeline
+from posts.counters import recount
+from posts.models import ArchivedPost, Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+KEY_MAP_SIZE = 100_000
+FORMATS = ('jsonl', 'csv')
+POST_COLUMNS = (
+    'id',
+    'text',
+    'pub_date',
+    'author',
+    'group',
+    'image',
+    'image_width',
+    'image_height',
+    'image_placeholder',
+    'image_bytes_saved',
+)
+POST_LOOKUPS = (
+    'id',
+    'text',
+    'pub_date',
+    'author__username',
+    'group__slug',
+    'image',
+    'image_width',
+    'image_height',
+    'image_placeholder',
+    'image_bytes_saved',
+)
+# Порядок важен: посты ссылаются на группы, комментарии — на посты.
+SECTIONS = {
+    'groups': (
+        Group,
+        ('slug', 'title', 'description'),
+        ('slug', 'title', 'description'),
+    ),
+    'posts': (Post, POST_COLUMNS, POST_LOOKUPS),
+    'archived_posts': (ArchivedPost, POST_COLUMNS, POST_LOOKUPS),
+    'comments': (
+        Comment,
+        ('id', 'post', 'author', 'text', 'created'),
+        ('id', 'post_id', 'author__username', 'text', 'created'),
+    ),
+    'follows': (
+        Follow,
+        ('user', 'author'),
+        ('user__username', 'author__username'),
+    ),
+}
+
+# Поля, по которым строка выгрузки с уже занятым pk считается той же
+# самой строкой, а не другой, случайно получившей тот же pk.
+IDENTITY_FIELDS = {
+    'posts': ('text', 'pub_date', 'author_id'),
+    'archived_posts': ('text', 'pub_date', 'author_id'),
+    'comments': ('post_id', 'author_id', 'text', 'created'),
+}
+# Пост с тем же pk может лежать в другом уровне.
+PK_TABLES = {
+    'posts': (Post, ArchivedPost),
+    'archived_posts': (Post, ArchivedPost),
+    'comments': (Comment,),
+}
+CONFLICTS_SHOWN = 10
+
+
+class ConflictError(Exception):
+    """pk из выгрузки уже занят в базе строкой с другим содержимым."""
+
+
+class KeyMap:
+    """Кэш соответствия естественного ключа (username, slug) и pk.
+
+    Недостающие ключи пачки догружаются одним запросом. Кэш ограничен
+    max_size ключами и при переполнении забывает самые старые, поэтому
+    память не растёт вместе с числом строк.
+    """
+
+    def __init__(self, queryset, field: str, create=None, max_size=None):
+        self.queryset = queryset
+        self.field = field
+        self.create = create
+        self.max_size = max_size or KEY_MAP_SIZE
+        self.pks = {}
+        self.created = 0
+
+    def resolve(self, keys) -> None:
+        keys = {key for key in keys if key}
+        missing = keys - self.pks.keys()
+        if not missing:
+            return
+        found = self.load(missing)
+        if self.create and len(found) < len(missing):
+            new = missing - found.keys()
+            self.create(new)
+            self.created += len(new)
+            found.update(self.load(new))
+        # Вытесняются самые старые ключи, кроме нужных текущей пачке.
+        overflow = len(self.pks) + len(found) - self.max_size
+        stale = (key for key in self.pks if key not in keys)
+        for key in list(islice(stale, max(overflow, 0))):
+            del self.pks[key]
+        self.pks.update(found)
+
+    def load(self, keys) -> dict:
+        return dict(
+            self.queryset.filter(**{f'{self.field}__in': keys}).values_list(
+                self.field, 'pk'
+            )
+        )
+
+    def __getitem__(self, key):
+        return self.pks[key] if key else None
+
+
+def create_users(usernames) -> None:
+    """Авторы, которых нет в базе, заводятся без пароля: войти они смогут
+    только после сброса."""
+    User.objects.bulk_create(
+        User(username=username, password=make_password(None))
+        for username in usernames
+    )
+
+
+def key_maps() -> dict:
+    return {
+        'users': KeyMap(User.objects.all(), 'username', create_users),
+        'groups': KeyMap(Group.objects.all(), 'slug'),
+    }
+
+
+def number(value):
+    return None if value in (None, '') else int(value)
+
+
+def date(value):
+    return parse_datetime(value) if value else None
+
+
+def group_objects(rows, maps) -> list:
+    return [
+        Group(
+            slug=row['slug'],
+            title=row['title'],
+            description=row['description'],
+        )
+        for row in rows
+    ]
+
+
+def post_objects(rows, maps, model=Post) -> list:
+    users, groups = maps['users'], maps['groups']
+    users.resolve(row['author'] for row in rows)
+    groups.resolve(row['group'] for row in rows)
+    return [
+        model(
+            id=number(row['id']),
+            text=row['text'],
+            pub_date=date(row['pub_date']),
+            author_id=users[row['author']],
+            group_id=groups[row['group']],
+            image=row['image'] or '',
+            image_width=number(row['image_width']),
+            image_height=number(row['image_height']),
+            image_placeholder=row['image_placeholder'] or '',
+            image_bytes_saved=number(row['image_bytes_saved']) or 0,
+        )
+        for row in rows
+    ]
+
+
+def comment_objects(rows, maps) -> list:
+    users = maps['users']
+    users.resolve(row['author'] for row in rows)
+    return [
+        Comment(
+            id=number(row['id']),
+            post_id=number(row['post']),
+            author_id=users[row['author']],
+            text=row['text'],
+            created=date(row['created']),
+        )
+        for row in rows
+    ]
+
+
+def follow_objects(rows, maps) -> list:
+    users = maps['users']
+    users.resolve(key for row in rows for key in (row['user'], row['author']))
+    return [
+        Follow(user_id=users[row['user']], author_id=users[row['author']])
+        for row in rows
+    ]
+
+
+BUILDERS = {
+    'groups': group_objects,
+    'posts': post_objects,
+    'archived_posts': partial(post_objects, model=ArchivedPost),
+    'comments': comment_objects,
+    'follows': follow_objects,
+}
+
+
+def serialize(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name: str, stream, fmt: str, batch_size=BATCH_SIZE) -> int:
+    """Пишет строки раздела в поток, читая базу курсором по batch_size."""
+    model, columns, lookups = SECTIONS[name]
+    rows = (
+        model.objects.order_by('pk')
+        .values_list(*lookups)
+        .iterator(chunk_size=batch_size)
+    )
+    writer = csv.writer(stream) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(columns)
+    total = 0
+    for row in rows:
+        values = [serialize(value) for value in row]
+        if writer:
+            writer.writerow(
+                ['' if value is None else value for value in values]
+            )
+        else:
+            stream.write(
+                json.dumps(dict(zip(columns, values)), ensure_ascii=False)
+            )
+            stream.write('\n')
+        total += 1
+    return total
+
+
+def read_rows(stream, fmt: str):
+    if fmt == 'csv':
+        # Поле CSV по умолчанию ограничено 128 КБ, а текст поста — нет.
+        csv.field_size_limit(2**31 - 1)
+        return csv.DictReader(stream)
+    return (json.loads(line) for line in stream if line.strip())
+
+
+@contextmanager
+def kept_dates(model):
+    """Выключает auto_now_add, чтобы загрузка сохранила исходные даты."""
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now_add', False)
+    ]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def new_objects(name: str, objects) -> list:
+    """Объекты пачки, которых ещё нет в базе.
+
+    Занятый pk с тем же содержимым — строка прошлой загрузки, она
+    пропускается. Занятый другой строкой pk — ConflictError: молча
+    пропущенный пост оставил бы его комментарии чужому посту.
+    """
+    fields = IDENTITY_FIELDS.get(name)
+    if fields is None:
+        return objects
+    pks = [obj.pk for obj in objects if obj.pk is not None]
+    existing = {}
+    for model in PK_TABLES[name]:
+        existing.update(
+            (pk, tuple(values))
+            for pk, *values in model.objects.filter(pk__in=pks).values_list(
+                'pk', *fields
+            )
+        )
+    conflicts = [
+        obj.pk
+        for obj in objects
+        if obj.pk in existing
+        and existing[obj.pk] != tuple(getattr(obj, field) for field in fields)
+    ]
+    if conflicts:
+        raise ConflictError(
+            f'{name}: pk {", ".join(map(str, conflicts[:CONFLICTS_SHOWN]))}'
+            f' уже заняты другими строками (всего {len(conflicts)})'
+        )
+    return [obj for obj in objects if obj.pk not in existing]
+
+
+def import_rows(name: str, rows, maps, batch_size=BATCH_SIZE, progress=None):
+    """Загружает строки раздела пачками через bulk_create.
+
+    Каждая пачка — своя транзакция. Строки, которые уже есть в базе
+    (тот же pk, slug или пара подписки), пропускаются, поэтому
+    прерванную загрузку можно просто запустить заново. Пачка, где pk
+    занят другой строкой, откатывается с ConflictError.
+    """
+    model = SECTIONS[name][0]
+    build = BUILDERS[name]
+    total = 0
+    with kept_dates(model):
+        for batch in timeline.chunked(rows, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(
+                    new_objects(name, build(batch, maps)),
+                    ignore_conflicts=True,
+                )
+            total += len(batch)
+            if progress:
+                progress(total)
+    return total
+
+
+def rebuild_derived() -> None:
+    """Восстанавливает то, что при обычной работе ведут сигналы:
+    последовательности pk, счётчики, ленты подписок, поисковый индекс
+    и кэш страниц."""
+    models = [model for model, *_ in SECTIONS.values()]
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+    recount()
+    timeline.fill()
+    search.rebuild()
+    # Доходит до веб-воркеров, только если кэш общий (см. CACHES).
+    cache.clear()
+
+
+def summary(name: str, total: int, started: float) -> str:
+    elapsed = max(time.monotonic() - started, 1e-6)
+    return f'{name}: {total} строк, {total / elapsed:.0f} строк/с'
@@ -0,0 +1,189 @@
+import base64
+import os
+import tempfile
+from io import BytesIO
+
+from django import forms
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.template.defaultfilters import filesizeformat
+from PIL import Image, ImageOps, features
+
+from yatube.settings import (
+    FILE_UPLOAD_MAX_MEMORY_SIZE,
+    IMAGE_MAX_EDGE,
+    IMAGE_PLACEHOLDER_SIZE,
+    IMAGE_REENCODE,
+    IMAGE_REENCODE_FORMAT,
+    IMAGE_REENCODE_QUALITY,
+    IMAGE_UPLOAD_MAX_PIXELS,
+    IMAGE_UPLOAD_MAX_SIZE,
+)
+
+PLACEHOLDER_URI = 'data:image/jpeg;base64,{}'
+TOO_LARGE = 'Файл больше {}.'
+TOO_MANY_PIXELS = 'Картинка больше {} мегапикселей.'
+SAVE_OPTIONS = {
+    'JPEG': {
+        'quality': IMAGE_REENCODE_QUALITY,
+        'progressive': True,
+        'optimize': True,
+    },
+    'WEBP': {'quality': IMAGE_REENCODE_QUALITY, 'method': 6},
+}
+# Форматы фотографий с телефонов и камер; остальное считается графикой.
+REENCODED_FORMATS = frozenset({'JPEG', 'MPO'})
+EXTENSIONS = {'JPEG': '.jpg', 'WEBP': '.webp'}
+METADATA = ('exif', 'icc_profile', 'XML:com.adobe.xmp', 'comment')
+
+
+class OversizedUpload(UploadedFile):
+    """Заглушка вместо файла, превысившего лимит: данные не хранятся,
+    остаётся только число полученных байт для сообщения об ошибке."""
+
+    def __init__(self, name, content_type, size):
+        super().__init__(BytesIO(), name, content_type, size)
+
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """Первый обработчик загрузки: считает байты на лету и, как только
+    файл превысил IMAGE_UPLOAD_MAX_SIZE, перестаёт передавать его
+    остальным обработчикам. Хвост файла не попадает ни в память,
+    ни на диск."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > IMAGE_UPLOAD_MAX_SIZE:
+            return None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.received > IMAGE_UPLOAD_MAX_SIZE:
+            return OversizedUpload(
+                self.file_name, self.content_type, self.received
+            )
+        return None
+
+
+def is_photo(image_format: str) -> bool:
+    return IMAGE_REENCODE and image_format in REENCODED_FORMATS
+
+
+def output_format(image_format: str) -> str:
+    """Формат сохранения: фотографии пережимаются в IMAGE_REENCODE_FORMAT,
+    графика (PNG, GIF) остаётся в своём формате."""
+    if not is_photo(image_format):
+        return image_format
+    if IMAGE_REENCODE_FORMAT == 'WEBP' and features.check('webp'):
+        return 'WEBP'
+    return 'JPEG'
+
+
+def reencode(upload, image_format: str) -> tuple:
+    """Пересохраняет оригинал одним проходом декодирования.
+
+    Картинка поворачивается по EXIF-ориентации, уменьшается до
+    IMAGE_MAX_EDGE (thumbnail() декодирует JPEG в draft-режиме, сразу в
+    уменьшенном масштабе) и сохраняется без EXIF, ICC и XMP. Результат
+    пишется во временный файл, который уходит на диск после
+    FILE_UPLOAD_MAX_MEMORY_SIZE. Если уменьшать и вычищать было нечего,
+    а пересохранение не сэкономило ни байта, остаётся оригинал.
+
+    Возвращает пару (файл, выигрыш в байтах).
+    """
+    upload.seek(0)
+    with Image.open(upload) as source:
+        if getattr(source, 'is_animated', False):
+            # Анимация пересохранилась бы первым кадром.
+            upload.seek(0)
+            return upload, 0
+        original_size = source.size
+        # Ориентация хранится в EXIF, так что поворот тоже попадает сюда.
+        changed = any(key in source.info for key in METADATA)
+        source.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE))
+        changed = changed or source.size != original_size
+        image = ImageOps.exif_transpose(source)
+    for key in METADATA:
+        image.info.pop(key, None)
+    target = output_format(image_format)
+    if target == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    output = tempfile.SpooledTemporaryFile(
+        max_size=FILE_UPLOAD_MAX_MEMORY_SIZE
+    )
+    image.save(output, target, **SAVE_OPTIONS.get(target, {}))
+    size = output.tell()
+    if not changed and size >= upload.size:
+        output.close()
+        upload.seek(0)
+        return upload, 0
+    output.seek(0)
+    name, extension = os.path.splitext(upload.name)
+    result = UploadedFile(
+        output,
+        name + EXTENSIONS.get(target, extension),
+        Image.MIME.get(target, upload.content_type),
+        size,
+    )
+    return result, upload.size - size
+
+
+def check_image(upload) -> tuple:
+    """Проверяет лимиты картинки, уже разобранной ImageField.
+
+    ImageField открывает файл только ради заголовка и verify(), поэтому
+    размеры известны без декодирования пикселей. Фотографии и слишком
+    большие по сторонам оригиналы сразу пересохраняются.
+
+    Возвращает пару (файл, выигрыш в байтах). Выигрыш — None, если новой
+    загрузки нет и у поста остаётся прежняя картинка.
+    """
+    if not upload or not hasattr(upload, 'image'):
+        return upload, None if upload else 0
+    width, height = upload.image.size
+    if width * height > IMAGE_UPLOAD_MAX_PIXELS:
+        raise forms.ValidationError(
+            TOO_MANY_PIXELS.format(IMAGE_UPLOAD_MAX_PIXELS // 10**6),
+            code='too_many_pixels',
+        )
+    image_format = upload.image.format
+    if max(width, height) <= IMAGE_MAX_EDGE and not is_photo(image_format):
+        return upload, 0
+    return reencode(upload, image_format)
+
+
+def oversized_error(upload):
+    """Ошибка для файла, который обработчик загрузки не стал принимать."""
+    if isinstance(upload, OversizedUpload):
+        return forms.ValidationError(
+            TOO_LARGE.format(filesizeformat(IMAGE_UPLOAD_MAX_SIZE)),
+            code='file_too_large',
+        )
+    return None
+
+
+def image_metadata(image) -> tuple:
+    """(ширина, высота, data URI размытой заглушки) картинки.
+
+    Размеры берутся из заголовка, заглушка декодируется в draft-режиме
+    сразу в крошечном масштабе. Файл остаётся открытым и перемотанным:
+    несохранённую загрузку ещё предстоит записать в хранилище.
+    """
+    image.open('rb')
+    try:
+        with Image.open(image) as source:
+            width, height = source.size
+            source.thumbnail((IMAGE_PLACEHOLDER_SIZE, IMAGE_PLACEHOLDER_SIZE))
+            buffer = BytesIO()
+            source.convert('RGB').save(buffer, 'JPEG', quality=50)
+    finally:
+        image.seek(0)
+    return (
+        width,
+        height,
+        PLACEHOLDER_URI.format(base64.b64encode(buffer.getvalue()).decode()),
+    )
@@ -1,55 +1,101 @@
+from functools import partial
+from urllib.parse import urlencode
+
 from django.contrib.auth.decorators import login_required
+from django.http import Http404
 from django.shortcuts import get_object_or_404, redirect, render
 
-from core.utils import paginate
+from core.page_cache import anonymous_page_cache, conditional_page
+from core.routers import replica_reads
+from core.utils import CursorPaginator, paginate
+from posts import archive, counts, pages, search
+from posts.feeds import follow_feed
 from posts.forms import CommentForm, PostForm
-from posts.models import Follow, Group, Post, User
+from posts.models import ArchivedPost, Comment, Follow, Group, Post, User
+from yatube.settings import COMMENT_PAGE_SIZE, PAGE_SIZE
 
 
+@replica_reads
+@conditional_page(pages.GROUP_PAGES, pages.group_validators)
+@anonymous_page_cache(pages.GROUP_PAGES)
 def group_posts(request, slug: str) -> None:
     group = get_object_or_404(Group, slug=slug)
+    post_list = group.posts.select_related('author', 'group')
     return render(
         request,
         'posts/group_list.html',
         {
             'group': group,
-            'page_obj': paginate(request, group.posts.all()),
+            'page_obj': paginate(
+                request,
+                post_list,
+                count=partial(
+                    counts.cached_count, post_list, counts.GROUP, group.pk
+                ),
+                archive=group.archived_posts.select_related('author', 'group'),
+            ),
         },
     )
 
 
+@replica_reads
+@conditional_page(pages.INDEX_PAGES, pages.index_validators)
+@anonymous_page_cache(pages.INDEX_PAGES)
 def index(request) -> None:
+    post_list = Post.objects.select_related('group', 'author')
     return render(
         request,
         'posts/index.html',
         {
             'page_obj': paginate(
-                request, Post.objects.select_related('group', 'author')
+                request,
+                post_list,
+                count=partial(counts.cached_count, post_list, counts.ALL),
+                archive=ArchivedPost.objects.select_related('group', 'author'),
             ),
         },
     )
 
 
+@replica_reads
+@conditional_page(pages.PROFILE_PAGES, pages.profile_validators)
+@anonymous_page_cache(pages.PROFILE_PAGES)
 def profile(request, username: str) -> None:
-    author = get_object_or_404(User, username=username)
+    author = get_object_or_404(
+        User.objects.select_related('counters'), username=username
+    )
+    post_list = author.posts.select_related('group', 'author')
     return render(
         request,
         'posts/profile.html',
         {
             'author': author,
             'page_obj': paginate(
-                request, author.posts.select_related('group', 'author')
+                request,
+                post_list,
+                count=partial(
+                    counts.cached_count,
+                    author.posts.all(),
+                    counts.AUTHOR,
+                    author.pk,
+                ),
+                archive=author.archived_posts.select_related(
+                    'group', 'author'
+                ),
             ),
-            'following': Follow.objects.select_related('user', 'author'),
+            'following': request.user.is_authenticated
+            and Follow.objects.filter(
+                user=request.user, author=author
+            ).exists(),
         },
     )
 
 
+@replica_reads
+@conditional_page(pages.POST_PAGES, pages.post_validators)
+@anonymous_page_cache(pages.POST_PAGES)
 def post_detail(request, pk: int):
-    post = get_object_or_404(
-        Post.objects.select_related('author', 'group'), pk=pk
-    )
-    comments = post.comments.all().select_related('author')
+    post = archive.get_post_or_404(pk, 'author__counters', 'group')
     form = CommentForm(request.POST or None)
     return render(
         request,
@@ -57,7 +103,50 @@ def post_detail(request, pk: int):
         {
             'post': post,
             'form': form,
-            'comments': comments,
+            'comments': comment_page(request, pk),
+        },
+    )
+
+
+def comment_page(request, pk: int):
+    """Страница комментариев поста от курсора ?after=, новые сверху."""
+    return CursorPaginator(
+        Comment.objects.filter(post_id=pk).select_related('author'),
+        COMMENT_PAGE_SIZE,
+        key='created',
+    ).get_cursor_page(after=request.GET.get('after'))
+
+
+@replica_reads
+@conditional_page(pages.POST_PAGES, pages.post_validators)
+@anonymous_page_cache(pages.POST_PAGES)
+def post_comments(request, pk: int):
+    """Фрагмент со следующей страницей комментариев для «Показать ещё»."""
+    comments = comment_page(request, pk)
+    # Раз комментарии нашлись, пост есть: проверяем только пустые.
+    if not comments and not archive.exists(pk):
+        raise Http404
+    return render(
+        request,
+        'posts/includes/comment_list.html',
+        {'post_pk': pk, 'comments': comments},
+    )
+
+
+@replica_reads
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    paginator = search.SearchPaginator(search.results(query), PAGE_SIZE)
+    return render(
+        request,
+        'posts/search.html',
+        {
+            'query': query,
+            'page_obj': paginator.get_cursor_page(
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+            ),
+            'params': urlencode({'q': query}) + '&',
         },
     )
 
@@ -110,13 +199,10 @@ def add_comment(request, pk):
 
 
 @login_required
+@replica_reads
 def follow_index(request):
-    post_list = Post.objects.select_related("author", "group").filter(
-        author__following__user=request.user
-    )
-    page_obj = paginate(request, post_list)
     context = {
-        'page_obj': page_obj,
+        'page_obj': follow_feed(request),
     }
     return render(request, 'posts/follow.html', context)
 
@@ -0,0 +1,12 @@
+// «Показать ещё»: следующая страница комментариев подгружается
+// фрагментом на место ссылки.
+document.getElementById('comments').addEventListener('click', function (event) {
+  var link = event.target.closest('[data-fragment]');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  fetch(link.dataset.fragment)
+    .then(function (response) { return response.text(); })
+    .then(function (html) { link.outerHTML = html; });
+});
@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve(strict=True).parent.parent
@@ -33,6 +34,7 @@ INSTALLED_APPS = [
 # fmt: on
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,13 +42,15 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.templates.TimedDjangoTemplates',
+        'NAME': 'django',
         'DIRS': [Path.joinpath(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -68,8 +72,28 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': str(BASE_DIR / 'db.sqlite3'),
     },
+    # Реплика только для чтения лент. Локально её заменяет копия
+    # db.sqlite3; в тестах она смотрит в ту же базу, что и default.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(BASE_DIR / 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Алиасы реплик, из которых читают ленты и страницы постов. Пустой
+# список отправляет всё чтение в default.
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи пользователь читает из основной базы.
+# Столько же после сброса кэша страниц его наполняет основная база:
+# это верхняя оценка отставания реплик.
+REPLICA_PIN_SECONDS = 10
+
+REPLICA_PIN_COOKIE = 'primary'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -85,6 +109,10 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# LocMemCache годится только для разработки: у каждого процесса он свой,
+# и сбросы из management-команд (import_content, archive_posts) и
+# замеры request_metrics до веб-воркеров не доходят. В бою нужен общий
+# кэш вроде memcached или Redis.
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
@@ -110,8 +138,138 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 PAGE_SIZE = 10
 
+COMMENT_PAGE_SIZE = 50
+
 MEDIA_URL = '/media/'
 
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 UPLOAD_TO = 'posts/'
+
+# Уровни вложенных каталогов хранилища картинок: posts/ab/cd/<sha256>.
+CONTENT_SHARD_LEVELS = 2
+
+# Файл с хэшем содержимого в имени не меняется никогда. Django ставит
+# этот заголовок только при DEBUG, в бою его ставит веб-сервер.
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Лимиты проверяются на лету, до того как файл целиком окажется на
+# диске, и до декодирования картинки.
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.UploadSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2_621_440
+
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+IMAGE_UPLOAD_MAX_PIXELS = 50_000_000
+
+# Оригиналы больше этого по длинной стороне уменьшаются при загрузке.
+IMAGE_MAX_EDGE = 3840
+
+# Фотографии при загрузке поворачиваются по EXIF, теряют метаданные и
+# пересохраняются в progressive JPEG или WebP (если его знает Pillow).
+IMAGE_REENCODE = True
+
+IMAGE_REENCODE_FORMAT = 'JPEG'
+
+IMAGE_REENCODE_QUALITY = 82
+
+# Длинная сторона встроенной в страницу размытой заглушки картинки.
+IMAGE_PLACEHOLDER_SIZE = 16
+
+COUNT_CACHE_TIMEOUT = 60 * 5
+
+# Счётчики лент больше COUNT_SHIFT_THRESHOLD оцениваются по темпу
+# публикаций, а после каждого поста сдвигаются на ±1 и живут
+# COUNT_SHIFT_TIMEOUT.
+COUNT_SHIFT_THRESHOLD = 10_000
+
+COUNT_SHIFT_TIMEOUT = 60 * 60
+
+TIMELINE_CHUNK_SIZE = 1000
+
+# Столько подписчиков получают новый пост в транзакции его сохранения,
+# остальным пост раскладывается после коммита.
+TIMELINE_FAN_OUT_INLINE = 100
+
+# 'timeline' — материализованная лента, 'merge' — слияние последних
+# постов авторов из кэша, 'join' — прямой JOIN Post с Follow.
+FOLLOW_FEED_ENGINE = 'timeline'
+
+FOLLOW_FEED_RECENT_LIMIT = 200
+
+FOLLOW_FEED_RECENT_TIMEOUT = 60 * 60
+
+POST_CARD_TIMEOUT = 60 * 60 * 24
+
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Пресеты миниатюр: имя -> (базовая геометрия, опции sorl-thumbnail).
+# Каждый пресет нарезается на все THUMBNAIL_WIDTHS в THUMBNAIL_FORMATS.
+THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+THUMBNAIL_WIDTHS = (480, 960, 1920)
+
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+
+THUMBNAIL_SIZES = {
+    'card': '(max-width: 576px) 100vw, 960px',
+}
+
+THUMBNAIL_PREGENERATE = True
+
+THUMBNAIL_WORKERS = 2
+
+THUMBNAIL_QUEUE_TIMEOUT = 60 * 10
+
+# Прогресс warm_thumbnails: файл вне репозитория, чтобы не попасть
+# в коммит и пережить пересборку проекта.
+THUMBNAIL_CHECKPOINT = Path(tempfile.gettempdir()) / 'yatube-thumbnails'
+
+# Поиск: сколько лучших совпадений хранится для одного запроса и какой
+# вес у совпадений в комментариях относительно текста поста.
+SEARCH_MAX_RESULTS = 500
+
+SEARCH_COMMENT_WEIGHT = 0.5
+
+# Запрос, повторённый столько раз за SEARCH_CACHE_TIMEOUT, кэшируется.
+SEARCH_CACHE_MIN_HITS = 2
+
+SEARCH_CACHE_TIMEOUT = 60 * 5
+
+# Посты старше стольких дней archive_posts переносит в архивную таблицу.
+ARCHIVE_AFTER_DAYS = 365 * 2
+
+ARCHIVE_BATCH_SIZE = 1000
+
+# Доля запросов, которые замеряет RequestMetricsMiddleware.
+REQUEST_METRICS_SAMPLE_RATE = 0.01
+
+# Алиас кэша для сумм замеров. Он должен быть общим для всех процессов
+# (memcached, Redis), иначе request_metrics не увидит замеров воркеров.
+REQUEST_METRICS_CACHE = 'default'
+
+# Замеры копятся в процессе и уходят в кэш пачкой: раз в столько
+# замеров или секунд, что наступит раньше.
+REQUEST_METRICS_FLUSH_SAMPLES = 20
+
+REQUEST_METRICS_FLUSH_SECONDS = 60
+
+# Бюджет запроса: превышение любого поля пишется в лог core.metrics.
+# duplicates — повторы одного SQL с разными параметрами (признак N+1).
+REQUEST_BUDGET = {
+    'queries': 30,
+    'duplicates': 5,
+    'db_ms': 200,
+    'template_ms': 200,
+    'wall_ms': 500,
+}
+
+# Бюджеты отдельных вью: {'posts:index': {'queries': 10}}.
+REQUEST_BUDGET_OVERRIDES = {}